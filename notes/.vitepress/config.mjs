@@ -3,48 +3,69 @@ import { withMermaid } from 'vitepress-plugin-mermaid'
 import fs from 'node:fs'
 import path from 'node:path'
 
-function generateSidebar() {
+// 由 utils/nav_manifest.py 維護（draft_publisher 搬移筆記時增量更新，
+// tools/build_sidebar.py 可完整重建）
+const NAV_MANIFEST = path.resolve(import.meta.dirname, 'sidebar.json')
+
+function scanNotes() {
   const notesDir = path.resolve(import.meta.dirname, '..')
-  const sidebar = []
+  const categories = {}
 
-  const dirs = fs.readdirSync(notesDir)
-    .filter(name => {
-      const full = path.join(notesDir, name)
-      return fs.statSync(full).isDirectory() && !name.startsWith('.')
-    })
+  const dirs = fs.readdirSync(notesDir, { withFileTypes: true })
+    .filter(entry => entry.isDirectory() && !entry.name.startsWith('.'))
+    .map(entry => entry.name)
     .sort()
 
   for (const dir of dirs) {
-    const dirPath = path.join(notesDir, dir)
-    const files = fs.readdirSync(dirPath)
+    categories[dir] = fs.readdirSync(path.join(notesDir, dir))
       .filter(f => f.endsWith('.md'))
       .sort()
+      .map(f => ({
+        text: f.replace(/\.md$/, ''),
+        link: `/${dir}/${f.replace(/\.md$/, '')}`,
+      }))
+  }
 
-    if (files.length === 0) continue
+  return categories
+}
 
-    const items = files.map(f => ({
-      text: f.replace(/\.md$/, ''),
-      link: `/${dir}/${f.replace(/\.md$/, '')}`,
-    }))
+function loadCategories() {
+  // manifest 不存在（例如尚未執行過 publisher）時退回掃描目錄
+  try {
+    return JSON.parse(fs.readFileSync(NAV_MANIFEST, 'utf-8')).categories
+  } catch (err) {
+    if (err.code !== 'ENOENT') throw err
+    return scanNotes()
+  }
+}
+
+function generateSidebar() {
+  const categories = loadCategories()
+  const sidebar = []
+
+  for (const dir of Object.keys(categories).sort()) {
+    const items = categories[dir]
+    if (items.length === 0) continue
 
     sidebar.push({
       text: dir,
       collapsed: false,
-      items,
+      items: items.map(({ text, link }) => ({ text, link })),
     })
   }
 
   return sidebar
 }
 
-function getFirstNoteLink() {
-  const sidebar = generateSidebar()
+function getFirstNoteLink(sidebar) {
   if (sidebar.length > 0 && sidebar[0].items.length > 0) {
     return sidebar[0].items[0].link
   }
   return '/'
 }
 
+const sidebar = generateSidebar()
+
 export default withMermaid(
   defineConfig({
     base: '/my-knowledge-base/',
@@ -53,9 +74,9 @@ export default withMermaid(
     themeConfig: {
       search: { provider: 'local' },
       nav: [
-        { text: 'Notes', link: getFirstNoteLink() },
+        { text: 'Notes', link: getFirstNoteLink(sidebar) },
       ],
-      sidebar: generateSidebar(),
+      sidebar,
     },
     mermaid: {},
   })
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Markdown → Notion blocks 轉換的 micro-benchmark 與效能回歸檢查。
+
+以合成的重負載文件（大表格、深層巢狀清單、大型 code block、大量 Mermaid、長篇 CJK 段落）
+分別量測 markdown_to_notion_blocks、inline_to_rich_text、_convert_table、
+_sanitize_mermaid_in_markdown 的耗時（中位數 / 最小值）與 tracemalloc 記憶體峰值。
+
+    python tools/bench_md_convert.py --save-baseline tools/bench-baseline.json
+    python tools/bench_md_convert.py --baseline tools/bench-baseline.json --threshold 0.2
+    python tools/bench_md_convert.py --ci
+
+與 baseline 比較時，任一案例的耗時或記憶體峰值超出 threshold 即以 exit code 1 結束。
+--ci 使用進版控的 tools/bench-baseline.json（找不到時 exit 1，而不是略過比較），
+且只比較記憶體峰值：耗時取決於機器，CI runner 與產生 baseline 的機器無法直接比較。
+--parser-cache 保留原本的比較：每次重建 mistune parser vs. 共用快取 parser。
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+# 加入 utils/ 目錄以匯入模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+import mistune
+import md_to_notion
+from md_to_notion import (
+    _convert_table,
+    _sanitize_mermaid_in_markdown,
+    inline_to_rich_text,
+    markdown_to_notion_blocks,
+    markdown_to_notion_blocks_many,
+    parse_markdown,
+)
+
+BASELINE_VERSION = 1
+# 進版控的 baseline；轉換邏輯有預期內的效能變化時以 --save-baseline 重新產生並 commit
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "bench-baseline.json")
+
+
+# ---------------------------------------------------------------------------
+# Synthetic corpora
+# ---------------------------------------------------------------------------
+
+def heavy_table(rows=300, cols=8):
+    header = "| " + " | ".join(f"欄位 {c}" for c in range(cols)) + " |"
+    sep = "|" + "---|" * cols
+    body = [
+        "| " + " | ".join(f"**r{r}c{c}** `v{r * c}` [l](https://e.com/{r}/{c})" for c in range(cols)) + " |"
+        for r in range(rows)
+    ]
+    return "\n".join(["# 大表格", "", header, sep, *body, ""])
+
+
+def nested_lists(depth=6, width=4):
+    lines = ["# 巢狀清單", ""]
+
+    def walk(level, prefix):
+        for i in range(width):
+            lines.append(f"{'  ' * level}- 項目 {prefix}{i}：*說明* 與 `code`")
+            if level + 1 < depth:
+                walk(level + 1, f"{prefix}{i}.")
+
+    walk(0, "")
+    return "\n".join(lines) + "\n"
+
+
+def large_code(blocks=5, lines_per_block=2000):
+    parts = ["# 程式碼", ""]
+    for b in range(blocks):
+        parts.append("```python")
+        parts += [f"def fn_{b}_{i}(x):  # 第 {i} 行\n    return x * {i}" for i in range(lines_per_block // 2)]
+        parts += ["```", ""]
+    return "\n".join(parts)
+
+
+def many_mermaid(diagrams=200, edges=15):
+    parts = ["# Mermaid", ""]
+    for d in range(diagrams):
+        parts += ["```mermaid", "graph TD"]
+        parts += [f"    N{d}_{e}[節點 (step {e})] -->|呼叫 (call {e})| N{d}_{e + 1}[下一步 (next)]"
+                  for e in range(edges)]
+        parts += ["```", ""]
+    return "\n".join(parts)
+
+
+def cjk_paragraphs(paragraphs=200, sentences=40):
+    sentence = "知識庫把 **Markdown 草稿** 轉成 Notion 頁面，*並保留* `格式` 與[連結](https://example.com)。😀"
+    return "\n\n".join(["# 長篇中文"] + [sentence * sentences for _ in range(paragraphs)]) + "\n"
+
+
+def _first_token(markdown, ttype):
+    return next(t for t in parse_markdown(markdown) if t["type"] == ttype)
+
+
+def build_cases(scale):
+    """回傳 [(案例名稱, 無參數 callable)]；文件與 AST 在計時前先準備好。"""
+    s = max(1, scale)
+    table_md = heavy_table(rows=300 * s)
+    lists_md = nested_lists(depth=6, width=3 + s)
+    code_md = large_code(lines_per_block=2000 * s)
+    mermaid_md = many_mermaid(diagrams=200 * s)
+    cjk_md = cjk_paragraphs(paragraphs=200 * s)
+
+    table_token = _first_token(table_md, "table")
+    cjk_inline = [t["children"] for t in parse_markdown(cjk_md) if t["type"] == "paragraph"]
+
+    return [
+        ("blocks/table", lambda: markdown_to_notion_blocks(table_md, for_notion=True)),
+        ("blocks/nested_lists", lambda: markdown_to_notion_blocks(lists_md, for_notion=True)),
+        ("blocks/large_code", lambda: markdown_to_notion_blocks(code_md, for_notion=True)),
+        ("blocks/mermaid", lambda: markdown_to_notion_blocks(mermaid_md, for_notion=True)),
+        ("blocks/cjk", lambda: markdown_to_notion_blocks(cjk_md, for_notion=True)),
+        ("inline_to_rich_text/cjk", lambda: [inline_to_rich_text(c) for c in cjk_inline]),
+        ("_convert_table", lambda: _convert_table(table_token)),
+        ("_sanitize_mermaid_in_markdown", lambda: _sanitize_mermaid_in_markdown(mermaid_md)),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def measure(fn, rounds):
+    """回傳 {"median_ms", "min_ms", "peak_kib"}；記憶體峰值另以一次 tracemalloc 執行量測。"""
+    fn()  # warm-up（parser 快取、regex 編譯）
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, threshold, metrics=("median_ms", "peak_kib")):
+    """回傳超出 threshold 的回歸項目 list（耗時以中位數比較）。"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            continue
+        for metric in metrics:
+            if base[metric] and current[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name} {metric}: {base[metric]} → {current[metric]} "
+                    f"(+{(current[metric] / base[metric] - 1):.0%})")
+    return regressions
+
+
+def run_suite(args):
+    cases = build_cases(args.scale)
+    if args.only:
+        cases = [(name, fn) for name, fn in cases if any(key in name for key in args.only)]
+    baseline = None
+    baseline_path = args.baseline or (DEFAULT_BASELINE if args.ci else None)
+    if baseline_path and not os.path.exists(baseline_path):
+        if args.ci:
+            shown = os.path.relpath(baseline_path)
+            print(f"❌ 找不到 baseline {shown}；以 --save-baseline {shown} 產生後 commit")
+            sys.exit(1)
+        print(f"⚠️ 找不到 baseline {baseline_path}，本次不做比較（首次執行可加 --save-baseline 建立）\n")
+    elif baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"{len(cases)} 個案例，每個重複 {args.rounds} 次（scale {args.scale}）\n")
+    print(f"  {'案例':<32} {'中位數':>10} {'最小值':>10} {'記憶體峰值':>12}  baseline")
+    results = {}
+    for name, fn in cases:
+        result = measure(fn, args.rounds)
+        results[name] = result
+        base = (baseline or {}).get("cases", {}).get(name)
+        delta = f"{result['median_ms'] / base['median_ms'] - 1:+.0%}" if base and base["median_ms"] else ""
+        print(f"  {name:<32} {result['median_ms']:8.2f}ms {result['min_ms']:8.2f}ms "
+              f"{result['peak_kib']:10.1f}KiB  {delta}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": BASELINE_VERSION,
+                "python": platform.python_version(),
+                "mistune": mistune.__version__,
+                "scale": args.scale,
+                "rounds": args.rounds,
+                "cases": results,
+            }, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n💾 baseline 已寫入 {args.save_baseline}")
+
+    if baseline is not None:
+        if baseline.get("scale") not in (None, args.scale):
+            print(f"\n⚠️ baseline 的 scale 為 {baseline['scale']}，與本次 {args.scale} 不同，比較結果僅供參考")
+        if (baseline.get("python"), baseline.get("mistune")) != (platform.python_version(), mistune.__version__):
+            print(f"\n⚠️ baseline 以 Python {baseline.get('python')} / mistune {baseline.get('mistune')} 產生，"
+                  f"本次為 Python {platform.python_version()} / mistune {mistune.__version__}")
+        metrics = ("peak_kib",) if args.ci else ("median_ms", "peak_kib")
+        regressions = compare(results, baseline, args.threshold, metrics)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 項超出 threshold {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✅ 所有案例都在 baseline 的 {args.threshold:.0%} 以內")
+
+
+# ---------------------------------------------------------------------------
+# Parser cache comparison
+# ---------------------------------------------------------------------------
+
+def _uncached_parser(plugins=md_to_notion.DEFAULT_PLUGINS):
+    """模擬舊行為：每份文件都重新建立 parser。"""
+    return mistune.create_markdown(renderer='ast', plugins=list(plugins))
+
+
+def _time_per_doc(convert, docs, rounds):
+    """回傳每份文件的平均耗時（毫秒）。"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        convert(docs)
+    elapsed = time.perf_counter() - started
+    return elapsed / (rounds * len(docs)) * 1000
+
+
+def run_parser_cache(files, rounds):
+    docs = []
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            docs.append(f.read())
+    print(f"文件數: {len(docs)}，重複 {rounds} 次\n")
+
+    cached_get_parser = md_to_notion._get_parser
+    try:
+        md_to_notion._get_parser = _uncached_parser
+        uncached = _time_per_doc(
+            lambda d: [markdown_to_notion_blocks(t, for_notion=True) for t in d], docs, rounds)
+    finally:
+        md_to_notion._get_parser = cached_get_parser
+
+    cached = _time_per_doc(
+        lambda d: [markdown_to_notion_blocks(t, for_notion=True) for t in d], docs, rounds)
+    batched = _time_per_doc(
+        lambda d: markdown_to_notion_blocks_many(d, for_notion=True), docs, rounds)
+
+    print(f"  每次重建 parser: {uncached:8.3f} ms/doc")
+    print(f"  快取 parser:     {cached:8.3f} ms/doc ({uncached / cached:.2f}x)")
+    print(f"  批次 API:        {batched:8.3f} ms/doc ({uncached / batched:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown 轉換 micro-benchmark 與回歸檢查")
+    parser.add_argument("--rounds", type=int, default=None,
+                        help="重複次數（預設：suite 5 次，--parser-cache 20 次）")
+    parser.add_argument("--scale", type=int, default=1, help="合成文件大小倍數（預設 1）")
+    parser.add_argument("--only", action="append", metavar="NAME",
+                        help="只執行名稱包含 NAME 的案例，可重複指定")
+    parser.add_argument("--baseline", metavar="PATH", help="與此 baseline JSON 比較")
+    parser.add_argument("--save-baseline", metavar="PATH", help="將本次結果寫成 baseline JSON")
+    parser.add_argument("--ci", action="store_true",
+                        help=f"CI 模式：預設使用 {os.path.relpath(DEFAULT_BASELINE)}，找不到 baseline 時 exit 1，"
+                             "只比較記憶體峰值")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="允許的退步比例，超出時 exit 1（預設 0.2 = 20%%）")
+    parser.add_argument("--parser-cache", nargs="*", metavar="FILE",
+                        help="改為比較 parser 快取效益（預設使用 notes/ 下所有筆記）")
+    args = parser.parse_args()
+
+    if args.parser_cache is not None:
+        files = args.parser_cache or sorted(glob.glob(
+            os.path.join(os.path.dirname(__file__), '..', 'notes', '*', '*.md')))
+        if not files:
+            parser.error("找不到任何 Markdown 檔案")
+        run_parser_cache(files, args.rounds or 20)
+        return
+
+    args.rounds = args.rounds or 5
+    run_suite(args)
+
+
+if __name__ == "__main__":
+    main()
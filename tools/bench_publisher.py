@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""以本機 fake Notion server 量測發布 / append / 讀取流程的吞吐量與延遲。
+
+每個語料規模（預設 10、100、1000 篇 draft）在獨立的暫存目錄執行
+（notes/、drafts/、.cache/ 都是相對路徑，manifest、索引與轉換快取因此都寫在暫存目錄），
+各模組的記憶體快取與 metrics 也在每個語料開始前清空：
+  dedup    draft_publisher.check_duplicates（近似重複檢查，不呼叫 API）
+  publish  draft_publisher.main（建立頁面、搬移檔案、更新狀態；略過 dedup）
+  append   append_blocks_batched（每頁追加合成 blocks）
+  read     get_page_content（讀回完整 block 樹並轉成 Markdown）
+輸出每階段的總耗時、吞吐量、單筆 p50/p99 延遲、HTTP 請求數與 429 次數。
+"""
+import argparse
+import contextlib
+import glob
+import io
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 加入 utils/ 目錄以匯入模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from fake_notion_server import FakeNotion, start_server
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+_WORDS = ("notion", "draft", "publish", "cache", "index", "batch", "latency", "token",
+          "parser", "sidebar", "manifest", "checkpoint", "retry", "stream", "block", "vector")
+
+
+def _synthetic_draft(i, sections):
+    # 每篇加入依 i 決定的隨機段落，避免整批 draft 幾乎相同（dedup 會把每一對都當成重複）
+    words = random.Random(i)
+    lines = [
+        "---",
+        f'title: "Bench Note {i:04d}"',
+        'category: "15-Dev-Tools"',
+        'tags: "bench, synthetic"',
+        "---",
+        f"# Bench Note {i:04d}",
+        "",
+    ]
+    for s in range(sections):
+        lines += [
+            f"## Section {s}",
+            "",
+            " ".join(words.choice(_WORDS) + str(words.randrange(1000)) for _ in range(40)),
+            "",
+            f"段落 {s}：**粗體** 與 *斜體*、`inline code`，以及 [連結](https://example.com/{i}/{s})。",
+            "",
+            "- 清單項目 A",
+            "  - 巢狀項目",
+            "- 清單項目 B",
+            "",
+            "```python",
+            f"def section_{s}():",
+            f"    return {s}",
+            "```",
+            "",
+            "| 欄位 | 值 |",
+            "|------|----|",
+            f"| s | {s} |",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _timed_map(fn, items, workers):
+    """並行執行 fn，回傳 (總耗時, 每筆耗時 list)"""
+    def timed(item):
+        started = time.perf_counter()
+        fn(item)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = list(executor.map(timed, items))
+    return time.perf_counter() - started, latencies
+
+
+def _report(stage, count, total, latencies, requests, rate_limited):
+    print(f"  {stage:<8} {count / total:8.1f} ops/s  總 {total:7.2f}s  "
+          f"p50 {_percentile(latencies, 50) * 1000:8.1f}ms  p99 {_percentile(latencies, 99) * 1000:8.1f}ms  "
+          f"請求 {requests:6d}  429 × {rate_limited}")
+
+
+def _reset_module_state():
+    """清空各模組的記憶體快取與 metrics，讓每個語料都從自己的暫存目錄重新載入。"""
+    import conversion_cache
+    import dedup_index
+    import metrics
+    import nav_manifest
+    import publish_manifest
+    import query_watermark
+
+    publish_manifest._manifest = None
+    nav_manifest._nav = None
+    dedup_index._index = dedup_index._buckets = dedup_index._stats = None
+    dedup_index._dirty = False
+    conversion_cache._size = None
+    query_watermark._watermarks = None
+    metrics.reset()
+
+
+def run_corpus(fake, size, args):
+    import clients
+    import draft_publisher
+    import publish_manifest
+    from notion_reader import get_page_content
+    from notion_writer import append_blocks_batched
+    from md_to_notion import markdown_to_notion_blocks
+
+    fake.reset()
+    _reset_module_state()
+    # client 連線池跨語料共用，只回報本語料的增量
+    pool_before = clients.get_pool_stats()
+
+    print(f"\n📦 {size} 篇 draft（每篇 {args.sections} 節）")
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            os.makedirs("drafts")
+            for i in range(size):
+                with open(f"drafts/bench-{i:04d}.md", "w", encoding="utf-8") as f:
+                    f.write(_synthetic_draft(i, args.sections))
+
+            def stage_counts():
+                return sum(v for k, v in fake.counts.items() if k != "rate_limited"), fake.counts["rate_limited"]
+
+            # dedup（單獨計時，publish 階段不再重複檢查）
+            with contextlib.redirect_stdout(io.StringIO()):
+                valid, _ = draft_publisher.validate_drafts(sorted(glob.glob("drafts/*.md")))
+                started = time.perf_counter()
+                duplicates = draft_publisher.check_duplicates(valid)
+                total = time.perf_counter() - started
+            print(f"  {'dedup':<8} {size / total:8.1f} ops/s  總 {total:7.2f}s  "
+                  f"近似重複 {len(duplicates)} 篇")
+
+            # publish
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                timings = draft_publisher.main(concurrency=args.concurrency, check_dedup=False)
+            total = time.perf_counter() - started
+            requests, limited = stage_counts()
+            _report("publish", size, total, list(timings.values()), requests, limited)
+
+            page_ids = [entry["page_id"] for entry in publish_manifest._load()["notes"].values()]
+
+            # append
+            extra = markdown_to_notion_blocks(_synthetic_draft(0, args.sections), for_notion=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                total, latencies = _timed_map(
+                    lambda page_id: append_blocks_batched(page_id, extra), page_ids, args.concurrency)
+            after_requests, after_limited = stage_counts()
+            _report("append", len(page_ids), total, latencies,
+                    after_requests - requests, after_limited - limited)
+            requests, limited = after_requests, after_limited
+
+            # read
+            with contextlib.redirect_stdout(io.StringIO()):
+                total, latencies = _timed_map(get_page_content, page_ids, args.concurrency)
+            after_requests, after_limited = stage_counts()
+            _report("read", len(page_ids), total, latencies,
+                    after_requests - requests, after_limited - limited)
+        finally:
+            os.chdir(cwd)
+
+    counts = {k: v for k, v in sorted(fake.counts.items()) if k != "rate_limited"}
+    print("  端點請求數: " + "、".join(f"{k} × {v}" for k, v in counts.items()))
+    pool = clients.get_pool_stats()
+    print(f"  連線: {pool['requests'] - pool_before['requests']} 次 HTTP 請求，"
+          f"新建 {pool['tcp_connects'] - pool_before['tcp_connects']} 條 TCP 連線")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="發布流程 benchmark（本機 fake Notion server）")
+    parser.add_argument("--sizes", default="10,100,1000", help="語料規模，逗號分隔（預設 10,100,1000）")
+    parser.add_argument("--sections", type=int, default=5, help="每篇 draft 的章節數（預設 5）")
+    parser.add_argument("--concurrency", type=int, default=3, help="並行數（預設 3）")
+    parser.add_argument("--rps", type=float, default=1000,
+                        help="client 端 rate limiter 每秒請求數（預設 1000，等同不限速）")
+    parser.add_argument("--latency", type=float, default=0.02, help="server 每個請求的延遲秒數（預設 0.02）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="額外隨機延遲上限（秒）")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="回傳 429 的請求比例（0~1）")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="429 回應的 Retry-After 秒數")
+    parser.add_argument("--max-page-size", type=int, default=100, help="list / query 每頁最多筆數")
+    args = parser.parse_args()
+
+    fake = FakeNotion(latency=args.latency, jitter=args.jitter,
+                      rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after,
+                      max_page_size=args.max_page_size)
+    server, base_url = start_server(fake)
+
+    # client / rate limiter 在第一次使用時依環境變數建立
+    os.environ["NOTION_BASE_URL"] = base_url
+    os.environ["NOTION_TOKEN"] = "bench-token"
+    os.environ["NOTION_DATABASE_ID"] = "bench-database"
+    os.environ["NOTION_REQUESTS_PER_SECOND"] = str(args.rps)
+
+    print(f"🧪 Fake Notion API: {base_url}（延遲 {args.latency * 1000:.0f}ms，"
+          f"429 比例 {args.rate_limit_ratio:.0%}，並行 {args.concurrency}，{args.rps:g} req/s）")
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            run_corpus(fake, size, args)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""掃描 notes/ 重建 VitePress 側邊欄 manifest（notes/.vitepress/sidebar.json）。
+
+draft_publisher 與 export_notes 寫入筆記時會自動增量更新 manifest；
+手動新增、改名或刪除 notes/ 中的筆記後，執行此工具重建。
+"""
+import argparse
+import os
+import sys
+import time
+
+# 加入 utils/ 目錄以匯入模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from constants import NAV_MANIFEST_PATH, NOTES_DIR
+from nav_manifest import rebuild
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重建 VitePress 側邊欄 manifest")
+    parser.add_argument("--notes-dir", default=NOTES_DIR, help=f"筆記目錄（預設 {NOTES_DIR}）")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = rebuild(args.notes_dir)
+    print(f"🧭 [Nav] {count} 篇筆記 → {NAV_MANIFEST_PATH}"
+          f"（{(time.perf_counter() - started) * 1000:.1f}ms）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""將 Notion 資料庫頁面批次匯出成 notes/ 下的 Markdown 筆記（反向同步）。"""
+import argparse
+import os
+import sys
+
+# 載入 utils/.env（確保從專案根目錄執行時也能讀取環境變數）
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'utils', '.env'))
+
+# 加入 utils/ 目錄以匯入模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from constants import EXPORT_WORKERS
+from notion_exporter import export_pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="匯出 Notion 頁面到 notes/")
+    parser.add_argument("--status", action="append", metavar="STATUS",
+                        help="只匯出指定 Status 的頁面，可重複指定（預設全部）")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS,
+                        help=f"並行抓取的頁面數（預設 {EXPORT_WORKERS}）")
+    parser.add_argument("--full", action="store_true",
+                        help="忽略 watermark，重新匯出所有頁面")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="notes/ 已有同名檔案時不覆寫")
+    args = parser.parse_args()
+
+    stats = export_pages(args.status, max_workers=args.workers,
+                         full=args.full, skip_existing=args.skip_existing)
+    print(f"\n📊 匯出 {stats['exported']}、略過 {stats['skipped']}、"
+          f"失敗 {stats['failed']}")
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""本機 Notion API 替身，供 benchmark 離線量測發布 / 讀取流程。
+
+實作 notion_writer、notion_reader、notion_sync 用到的端點（資料存在記憶體）：
+  POST   /v1/pages                     建立頁面（含 children）
+  PATCH  /v1/pages/{id}                更新 properties
+  GET    /v1/databases/{id}            資料庫 schema
+  POST   /v1/databases/{id}/query      查詢（支援 Status / last_edited_time filter 與分頁）
+  GET    /v1/blocks/{id}/children      列出子 blocks（分頁）
+  PATCH  /v1/blocks/{id}/children      append（支援 after）
+  PATCH  /v1/blocks/{id}               更新 block
+  DELETE /v1/blocks/{id}               刪除 block
+
+可設定每個請求的延遲、429 注入比例與分頁大小上限，並統計各端點請求數。
+
+    python tools/fake_notion_server.py --port 8765 --latency 0.05 --rate-limit-ratio 0.02
+    NOTION_BASE_URL=http://127.0.0.1:8765 python utils/draft_publisher.py
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Notion 單次請求的 children / 分頁上限
+CHILDREN_LIMIT = 100
+
+_ROUTES = [
+    ("POST", re.compile(r"^/v1/pages$"), "pages.create"),
+    ("PATCH", re.compile(r"^/v1/pages/(?P<id>[^/]+)$"), "pages.update"),
+    ("GET", re.compile(r"^/v1/databases/(?P<id>[^/]+)$"), "databases.retrieve"),
+    ("POST", re.compile(r"^/v1/databases/(?P<id>[^/]+)/query$"), "databases.query"),
+    ("GET", re.compile(r"^/v1/blocks/(?P<id>[^/]+)/children$"), "blocks.children.list"),
+    ("PATCH", re.compile(r"^/v1/blocks/(?P<id>[^/]+)/children$"), "blocks.children.append"),
+    ("PATCH", re.compile(r"^/v1/blocks/(?P<id>[^/]+)$"), "blocks.update"),
+    ("DELETE", re.compile(r"^/v1/blocks/(?P<id>[^/]+)$"), "blocks.delete"),
+]
+
+DATABASE_PROPERTIES = {
+    "Name": {"id": "title", "type": "title"},
+    "Status": {"id": "status", "type": "status"},
+    "Category": {"id": "category", "type": "select"},
+    "Tags": {"id": "tags", "type": "multi_select"},
+    "Updated Time": {"id": "updated", "type": "date"},
+}
+
+
+class NotionError(Exception):
+    def __init__(self, status, code, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.headers = headers or {}
+
+
+def _now():
+    # Notion 的 last_edited_time 只到分鐘
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:00.000Z")
+
+
+def _with_plain_text(rich_text):
+    """補上 API 回應才有的 plain_text / href / annotations 欄位"""
+    items = []
+    for item in rich_text:
+        text = item.get("text", {})
+        items.append({
+            "type": "text",
+            "text": text,
+            "annotations": {"bold": False, "italic": False, "strikethrough": False,
+                            "underline": False, "code": False, "color": "default",
+                            **item.get("annotations", {})},
+            "plain_text": text.get("content", ""),
+            "href": (text.get("link") or {}).get("url"),
+        })
+    return items
+
+
+class FakeNotion:
+    """記憶體內的頁面 / block 儲存，thread-safe。"""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit_ratio=0.0, retry_after=0.1,
+                 max_page_size=CHILDREN_LIMIT, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.max_page_size = max_page_size
+        self.counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self.pages = {}
+        self.blocks = {}
+        self.children = {}
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self.pages.clear()
+            self.blocks.clear()
+            self.children.clear()
+
+    # -- request entry -----------------------------------------------------
+
+    def handle(self, method, path, query, body):
+        for route_method, pattern, name in _ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                break
+        else:
+            raise NotionError(400, "invalid_request_url", f"Invalid request URL: {method} {path}")
+
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.counts[name] += 1
+            if self.rate_limit_ratio and self._random.random() < self.rate_limit_ratio:
+                self.counts["rate_limited"] += 1
+                raise NotionError(429, "rate_limited", "Rate limited",
+                                  {"Retry-After": str(self.retry_after)})
+            handler = getattr(self, "_" + name.replace(".", "_"))
+            return handler(match.group("id") if "id" in match.groupdict() else None, query, body)
+
+    # -- storage helpers ---------------------------------------------------
+
+    def _new_id(self):
+        return str(uuid.UUID(int=next(self._seq) + 1))
+
+    def _store_children(self, parent_id, children, after=None):
+        if len(children) > CHILDREN_LIMIT:
+            raise NotionError(400, "validation_error",
+                              f"body.children.length should be ≤ `{CHILDREN_LIMIT}`, instead was `{len(children)}`.")
+        created = []
+        for child in children:
+            btype = child["type"]
+            data = dict(child.get(btype, {}))
+            nested = data.pop("children", [])
+            for field in ("rich_text", "caption"):
+                if field in data:
+                    data[field] = _with_plain_text(data[field])
+            if "cells" in data:
+                data["cells"] = [_with_plain_text(cell) for cell in data["cells"]]
+            block_id = self._new_id()
+            self.blocks[block_id] = {"object": "block", "id": block_id, "type": btype,
+                                     btype: data, "has_children": False}
+            self._store_children(block_id, nested)
+            created.append(block_id)
+
+        siblings = self.children.setdefault(parent_id, [])
+        index = siblings.index(after) + 1 if after in siblings else len(siblings)
+        siblings[index:index] = created
+        if parent_id in self.blocks:
+            self.blocks[parent_id]["has_children"] = bool(siblings)
+        return [self.blocks[b] for b in created]
+
+    def _paginate(self, items, query_or_body):
+        start = int(query_or_body.get("start_cursor") or 0)
+        size = min(int(query_or_body.get("page_size") or CHILDREN_LIMIT), self.max_page_size)
+        end = start + size
+        return {"object": "list", "results": items[start:end],
+                "has_more": end < len(items), "next_cursor": str(end) if end < len(items) else None}
+
+    def _remove_tree(self, block_id):
+        for child_id in self.children.pop(block_id, []):
+            self._remove_tree(child_id)
+        self.blocks.pop(block_id, None)
+
+    def _get_page(self, page_id):
+        page = self.pages.get(page_id)
+        if page is None:
+            raise NotionError(404, "object_not_found", f"Could not find page with ID: {page_id}.")
+        return page
+
+    # -- endpoints ---------------------------------------------------------
+
+    def _pages_create(self, _, query, body):
+        page_id = self._new_id()
+        properties = body.get("properties", {})
+        title = properties.get("Name", {}).get("title", [])
+        properties["Name"] = {"id": "title", "type": "title", "title": _with_plain_text(title)}
+        now = _now()
+        page = {"object": "page", "id": page_id, "created_time": now, "last_edited_time": now,
+                "parent": body.get("parent"), "properties": properties, "archived": False}
+        self.pages[page_id] = page
+        self._store_children(page_id, body.get("children", []))
+        return page
+
+    def _pages_update(self, page_id, query, body):
+        page = self._get_page(page_id)
+        page["properties"].update(body.get("properties", {}))
+        page["last_edited_time"] = _now()
+        return page
+
+    def _databases_retrieve(self, database_id, query, body):
+        return {"object": "database", "id": database_id, "properties": DATABASE_PROPERTIES}
+
+    def _databases_query(self, database_id, query, body):
+        pages = [p for p in self.pages.values()
+                 if (p.get("parent") or {}).get("database_id") == database_id
+                 and self._matches(p, body.get("filter"))]
+        for sort in reversed(body.get("sorts", [])):
+            pages.sort(key=lambda p: p.get(sort.get("timestamp", "created_time"), ""),
+                       reverse=sort.get("direction") == "descending")
+        return self._paginate(pages, body)
+
+    def _matches(self, page, condition):
+        if not condition:
+            return True
+        if "and" in condition:
+            return all(self._matches(page, c) for c in condition["and"])
+        if "or" in condition:
+            return any(self._matches(page, c) for c in condition["or"])
+        if condition.get("timestamp") in ("last_edited_time", "created_time"):
+            timestamp = condition["timestamp"]
+            since = condition[timestamp].get("on_or_after")
+            return since is None or page[timestamp] >= since
+        if "title" in condition:
+            title = page["properties"].get(condition["property"], {}).get("title", [])
+            return "".join(t["plain_text"] for t in title) == condition["title"].get("equals")
+        if "status" in condition:
+            status = (page["properties"].get(condition["property"], {}).get("status") or {}).get("name")
+            return status == condition["status"].get("equals")
+        return True
+
+    def _blocks_children_list(self, block_id, query, body):
+        if block_id not in self.pages and block_id not in self.blocks:
+            raise NotionError(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+        items = [self.blocks[b] for b in self.children.get(block_id, [])]
+        return self._paginate(items, query)
+
+    def _blocks_children_append(self, block_id, query, body):
+        if block_id not in self.pages and block_id not in self.blocks:
+            raise NotionError(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+        created = self._store_children(block_id, body.get("children", []), body.get("after"))
+        if block_id in self.pages:
+            self.pages[block_id]["last_edited_time"] = _now()
+        return {"object": "list", "results": created, "has_more": False, "next_cursor": None}
+
+    def _blocks_update(self, block_id, query, body):
+        block = self.blocks.get(block_id)
+        if block is None:
+            raise NotionError(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+        data = body.get(block["type"], {})
+        if "rich_text" in data:
+            data = dict(data, rich_text=_with_plain_text(data["rich_text"]))
+        block[block["type"]].update(data)
+        return block
+
+    def _blocks_delete(self, block_id, query, body):
+        for siblings in self.children.values():
+            if block_id in siblings:
+                siblings.remove(block_id)
+                break
+        block = self.blocks.get(block_id, {"object": "block", "id": block_id})
+        self._remove_tree(block_id)
+        return dict(block, archived=True)
+
+
+def _make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive，讓 client 連線池可重用連線
+        disable_nagle_algorithm = True  # headers 與 body 分開寫出，避免 Nagle + delayed ACK 的 40ms 延遲
+
+        def _dispatch(self):
+            url = urlparse(self.path)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            headers = {}
+            try:
+                status, payload = 200, fake.handle(self.command, url.path, query, body)
+            except NotionError as e:
+                status, headers = e.status, e.headers
+                payload = {"object": "error", "status": e.status, "code": e.code, "message": str(e)}
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = do_DELETE = _dispatch
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(fake, host="127.0.0.1", port=0):
+    """在背景執行緒啟動 server，回傳 (server, base_url)；以 server.shutdown() 停止。"""
+    server = ThreadingHTTPServer((host, port), _make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機 Notion API 替身")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求的固定延遲秒數")
+    parser.add_argument("--jitter", type=float, default=0.0, help="額外隨機延遲上限（秒）")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0,
+                        help="回傳 429 的請求比例（0~1）")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="429 回應的 Retry-After 秒數")
+    parser.add_argument("--max-page-size", type=int, default=CHILDREN_LIMIT,
+                        help="list / query 每頁最多回傳筆數")
+    args = parser.parse_args()
+
+    fake = FakeNotion(latency=args.latency, jitter=args.jitter,
+                      rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after,
+                      max_page_size=args.max_page_size)
+    server, base_url = start_server(fake, port=args.port)
+    print(f"🧪 Fake Notion API: {base_url}（Ctrl+C 結束）")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\n請求統計: {dict(fake.counts)}")
+
+
+if __name__ == "__main__":
+    main()
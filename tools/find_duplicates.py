@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""找出 notes/ 中彼此近似重複的筆記，或檢查指定的 Markdown 檔案是否與既有筆記重複。
+
+以 MinHash + LSH 索引（notes/.dedup-index.json）比對，執行前會先同步 notes/ 的變更。
+"""
+import argparse
+import os
+import sys
+
+# 加入 utils/ 目錄以匯入模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+import dedup_index
+from constants import DEDUP_THRESHOLD
+from draft_ingest import read_draft
+
+
+def main():
+    parser = argparse.ArgumentParser(description="近似重複筆記檢查（MinHash + LSH）")
+    parser.add_argument("files", nargs="*", metavar="FILE",
+                        help="要檢查的 Markdown 檔案（省略則列出 notes/ 之間的近似重複）")
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD,
+                        help=f"視為近似重複的估計 Jaccard 相似度（預設 {DEDUP_THRESHOLD}）")
+    args = parser.parse_args()
+
+    stats = dedup_index.refresh()
+    if stats["indexed"] or stats["removed"]:
+        print(f"🗂️ [Dedup] 重新計算 {stats['indexed']} 篇、移除 {stats['removed']} 篇\n")
+
+    if not args.files:
+        pairs = dedup_index.duplicate_pairs(args.threshold)
+        if not pairs:
+            print(f"✅ notes/ 中沒有相似度 ≥ {args.threshold:.0%} 的筆記")
+        for a, b, score in pairs:
+            print(f"  {score:5.0%}  {a}\n         {b}")
+        return
+
+    found = False
+    for path in args.files:
+        _, body = read_draft(path, strict=False)
+        matches = dedup_index.query(dedup_index.signature(body), args.threshold,
+                                    exclude=[os.path.normpath(path)])
+        for other, score in matches:
+            found = True
+            print(f"  {score:5.0%}  {path} ≈ {other}")
+    if not found:
+        print(f"✅ 沒有相似度 ≥ {args.threshold:.0%} 的既有筆記")
+    sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
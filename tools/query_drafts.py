@@ -11,11 +11,19 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'utils', '.env'))
 # 加入 utils/ 目錄以匯入模組
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
 
-from notion_reader import get_draft_pages, get_page_content
+from notion_reader import get_draft_pages, get_page_content, query_changed_pages
+from query_watermark import advance_watermark, load_watermark, watermark_key
 
 
-def list_drafts():
-    pages = get_draft_pages()
+def list_drafts(changed_only=False):
+    if changed_only:
+        # 只查詢上次執行後有編輯過的 Draft 頁面，列出後推進 watermark
+        key = watermark_key("query_drafts", "Draft")
+        print(f"查詢 {load_watermark(key) or '所有'} 之後有變更的頁面")
+        pages = query_changed_pages(key, "Draft")
+        advance_watermark(key, pages)
+    else:
+        pages = get_draft_pages()
     if not pages:
         print("沒有找到任何 Draft 頁面。")
         return
@@ -49,12 +57,14 @@ def main():
     parser = argparse.ArgumentParser(description="查詢 Notion Draft 頁面")
     parser.add_argument("--content", metavar="PAGE_ID",
                         help="查看特定頁面的完整 Markdown 內容")
+    parser.add_argument("--changed", action="store_true",
+                        help="只列出上次 --changed 之後有編輯過的 Draft 頁面")
     args = parser.parse_args()
 
     if args.content:
         show_content(args.content)
     else:
-        list_drafts()
+        list_drafts(changed_only=args.changed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""在本機搜尋 notes/ 中的筆記（BM25 排序，中文以 bigram 比對）。
+
+索引存在 .cache/search-index.sqlite3；每次查詢前依 mtime / hash 增量更新。
+"""
+import argparse
+import os
+import sys
+import time
+
+# 加入 utils/ 目錄以匯入模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from search_index import connect, search, update_index
+
+
+def _snippet(text, width=80):
+    text = " ".join(text.split())
+    return text if len(text) <= width else text[:width] + "…"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜尋 notes/ 中的筆記")
+    parser.add_argument("query", nargs="?", help="查詢字串")
+    parser.add_argument("--limit", type=int, default=10, help="最多顯示筆數（預設 10）")
+    parser.add_argument("--rebuild", action="store_true", help="清空並重建索引")
+    parser.add_argument("--no-update", action="store_true", help="不檢查檔案變更，直接查詢既有索引")
+    args = parser.parse_args()
+    if not args.query and not args.rebuild:
+        parser.error("請指定查詢字串或 --rebuild")
+
+    conn = connect()
+    if not args.no_update or args.rebuild:
+        started = time.perf_counter()
+        stats = update_index(conn, rebuild=args.rebuild)
+        if stats["indexed"] or stats["removed"] or args.rebuild:
+            print(f"🗂️ [Index] 重建 {stats['indexed']}、移除 {stats['removed']}、"
+                  f"未變更 {stats['unchanged'] + stats['touched']}"
+                  f"（{(time.perf_counter() - started) * 1000:.1f}ms）\n")
+    if not args.query:
+        return
+
+    started = time.perf_counter()
+    results = search(conn, args.query, limit=args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    if not results:
+        print(f"找不到「{args.query}」相關的筆記（{elapsed:.1f}ms）")
+        return
+
+    print(f"「{args.query}」找到 {len(results)} 筆（{elapsed:.1f}ms）：\n")
+    for result in results:
+        location = f"{result['path']}:{result['line']}"
+        heading = f" › {result['heading']}" if result["heading"] and result["heading"] != result["title"] else ""
+        print(f"  {result['score']:6.2f}  {result['title']}{heading}")
+        print(f"          {location}")
+        if result["text"]:
+            print(f"          {_snippet(result['text'])}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
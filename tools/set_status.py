@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""批次更新 Notion 頁面的 Status（例如將所有 Processed 頁面改為 Archived）。"""
+import argparse
+import os
+import sys
+
+# 載入 utils/.env（確保從專案根目錄執行時也能讀取環境變數）
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'utils', '.env'))
+
+# 加入 utils/ 目錄以匯入模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from constants import BULK_STATUS_WORKERS
+from notion_reader import query_pages
+from notion_writer import update_pages_status_bulk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批次更新 Notion 頁面狀態")
+    parser.add_argument("status", help="要設定的新狀態，例如 Archived")
+    parser.add_argument("page_ids", nargs="*", metavar="PAGE_ID",
+                        help="要更新的頁面 ID")
+    parser.add_argument("--where-status", action="append", metavar="STATUS",
+                        help="更新目前為此狀態的所有頁面，可重複指定")
+    parser.add_argument("--workers", type=int, default=BULK_STATUS_WORKERS,
+                        help=f"同時進行中的更新請求數（預設 {BULK_STATUS_WORKERS}）")
+    args = parser.parse_args()
+
+    page_ids = list(args.page_ids)
+    if args.where_status:
+        # 只需要頁面 id，title 為最小的 property 投影
+        page_ids += [page["id"] for page in query_pages(args.where_status, properties=["Name"])]
+    if not page_ids:
+        parser.error("請指定 PAGE_ID 或 --where-status")
+
+    summary = update_pages_status_bulk(page_ids, args.status, max_workers=args.workers)
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,27 +8,32 @@ import sys
 # 加入 utils/ 目錄以匯入模組
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
 
-from md_to_notion import markdown_to_notion_blocks
+from constants import NOTION_RICH_TEXT_ARRAY_LIMIT, NOTION_RICH_TEXT_LIMIT
+import conversion_cache
+from draft_ingest import read_draft, strip_frontmatter
+from publish_planner import format_plan, plan_page
 
 
-def strip_frontmatter(text):
-    """如果內容以 YAML frontmatter 開頭（---），則剝離並回傳 body。"""
-    if not text.startswith("---"):
-        return text
-    parts = text.split("---", 2)
-    if len(parts) < 3:
-        return text
-    return parts[2].lstrip("\n")
+def convert_md_to_blocks(md_text, for_notion=True):
+    """執行 Markdown → Notion blocks 轉換（使用 mistune AST parser，內容未變時讀取快取）。"""
+    return conversion_cache.cached_notion_blocks(md_text, for_notion=for_notion)
 
 
-def convert_md_to_blocks(md_text, for_notion=True):
-    """執行 Markdown → Notion blocks 轉換（使用 mistune AST parser）。"""
-    return markdown_to_notion_blocks(md_text, for_notion=for_notion)
+def _check_rich_text(rich_text, where, issues):
+    """檢查 rich_text 的元素數量與單一片段長度是否超過 Notion 上限。"""
+    if len(rich_text) > NOTION_RICH_TEXT_ARRAY_LIMIT:
+        issues.append(f"[rich_text 元素過多] {where}, {len(rich_text)} 個")
+    for rt in rich_text:
+        content = rt.get("text", {}).get("content", "")
+        if len(content) > NOTION_RICH_TEXT_LIMIT:
+            issues.append(
+                f"[超長 rich_text] {where}, "
+                f"{len(content)} 字元 (前 50 字: {content[:50]}...)"
+            )
 
 
-def print_summary(blocks, preview_count=5):
-    """印出 block 統計、潛在問題與前 N 個 blocks 預覽。"""
-    # 統計各類型 block 數量
+def find_issues(blocks):
+    """遞迴統計各類型 block 數量並找出潛在問題，回傳 (type_counts, issues)。"""
     type_counts = {}
     issues = []
 
@@ -39,14 +44,10 @@ def print_summary(blocks, preview_count=5):
 
             block_data = block.get(btype, {})
             if isinstance(block_data, dict):
-                # 檢查 rich_text 長度
-                for rt in block_data.get("rich_text", []):
-                    content = rt.get("text", {}).get("content", "")
-                    if len(content) > 1800:
-                        issues.append(
-                            f"[超長 rich_text] {btype} block, "
-                            f"{len(content)} 字元 (前 50 字: {content[:50]}...)"
-                        )
+                # 檢查 rich_text 長度與元素數量（表格每個儲存格各自受限）
+                _check_rich_text(block_data.get("rich_text", []), f"{btype} block", issues)
+                for column, cell in enumerate(block_data.get("cells", [])):
+                    _check_rich_text(cell, f"{btype} 第 {column + 1} 欄", issues)
 
                 # 檢查空語言 code block
                 if btype == "code":
@@ -64,6 +65,12 @@ def print_summary(blocks, preview_count=5):
                     count_blocks(children, depth + 1)
 
     count_blocks(blocks)
+    return type_counts, issues
+
+
+def print_summary(blocks, preview_count=5):
+    """印出 block 統計、潛在問題與前 N 個 blocks 預覽。"""
+    type_counts, issues = find_issues(blocks)
 
     # 印出統計
     total = sum(type_counts.values())
@@ -94,6 +101,28 @@ def print_summary(blocks, preview_count=5):
             print(f"  [{i}] {btype}")
 
 
+# 轉換器的邊界案例：轉換結果都不應有任何潛在問題
+SELF_CHECK_CASES = {
+    "超長段落": "x" * 5000,
+    "超長 code block": "```python\n" + "print('hello')\n" * 500 + "```",
+    "段落格式片段過多": " ".join(f"**b{i}** p{i}" for i in range(120)),
+    "表格儲存格格式片段過多": "| a | b |\n|---|---|\n| " + " ".join(f"**b{i}** p{i}" for i in range(120)) + " | x |",
+    "表格儲存格超長": "| a |\n|---|\n| " + "y" * 5000 + " |",
+}
+
+
+def run_self_check():
+    """轉換 SELF_CHECK_CASES 並檢查潛在問題，全部通過回傳 True。"""
+    ok = True
+    for name, md_text in SELF_CHECK_CASES.items():
+        _, issues = find_issues(convert_md_to_blocks(md_text))
+        print(f"{'✅' if not issues else '❌'} {name}")
+        for issue in issues:
+            print(f"    - {issue}")
+        ok = ok and not issues
+    return ok
+
+
 def filter_blocks(blocks, block_type):
     """遞迴篩選特定類型的 blocks。"""
     result = []
@@ -119,24 +148,38 @@ def main():
                         help="輸出完整 Notion block JSON")
     parser.add_argument("--filter", metavar="TYPE",
                         help="只顯示特定類型的 blocks（例如 code, table, heading_2）")
+    parser.add_argument("--plan", action="store_true",
+                        help="額外估算 payload 大小、API 請求數與預估耗時（dry-run）")
     parser.add_argument("--raw", action="store_true",
                         help="不剝離 YAML frontmatter，不啟用 for_notion 過濾（除錯用）")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="略過 .cache/ 中的轉換快取，一律重新轉換（修改轉換器時使用）")
+    parser.add_argument("--self-check", action="store_true",
+                        help="轉換內建的邊界案例並檢查潛在問題，有問題時以 exit code 1 結束")
     args = parser.parse_args()
+    conversion_cache.set_enabled(not args.no_cache)
+
+    if args.self_check:
+        sys.exit(0 if run_self_check() else 1)
 
     # 讀取 Markdown 內容
+    # 預設行為：模擬實際寫入 Notion 的流程（剝離 frontmatter + for_notion=True）
     if args.file == "-":
         if sys.stdin.isatty():
             parser.error("請提供檔案路徑或透過 stdin 傳入 Markdown 內容")
         md_text = sys.stdin.read()
-    else:
+        print(f"讀取 Markdown: {len(md_text)} 字元")
+        if not args.raw:
+            md_text = strip_frontmatter(md_text)
+    elif args.raw:
         with open(args.file, "r", encoding="utf-8") as f:
             md_text = f.read()
+        print(f"讀取 Markdown: {len(md_text)} 字元")
+    else:
+        print(f"讀取 Markdown: {os.path.getsize(args.file)} bytes")
+        _, md_text = read_draft(args.file, strict=False)
 
-    print(f"讀取 Markdown: {len(md_text)} 字元")
-
-    # 預設行為：模擬實際寫入 Notion 的流程（剝離 frontmatter + for_notion=True）
     if not args.raw:
-        md_text = strip_frontmatter(md_text)
         print(f"剝離 frontmatter 後: {len(md_text)} 字元\n")
     else:
         print("(--raw 模式：不剝離 frontmatter，不啟用 for_notion 過濾)\n")
@@ -155,6 +198,10 @@ def main():
     else:
         print_summary(blocks)
 
+    if args.plan:
+        print("\n=== 發布預估 (dry-run) ===")
+        print(format_plan(plan_page(blocks)))
+
 
 if __name__ == "__main__":
     main()
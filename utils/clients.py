@@ -4,12 +4,25 @@ Uses lazy singletons so importing conversion-only functions
 (e.g. markdown_to_notion_blocks in test tools) doesn't require API keys.
 """
 
+import asyncio
+import importlib.util
 import os
+import threading
 from dotenv import load_dotenv
-from constants import NOTION_API_VERSION
+import constants
+import metrics
+from constants import ASYNC_MAX_IN_FLIGHT, NOTION_API_VERSION, NOTION_REQUESTS_PER_SECOND
+from rate_limiter import RateLimiter
 
-# Module-level singleton (populated on first call)
+# Module-level singletons (populated on first call)
 _notion_client = None
+_rate_limiter = None
+# Async client and semaphore are bound to the event loop that created them
+_async_loop = None
+_async_notion_client = None
+_async_semaphore = None
+# Guards singleton creation when worker threads race on first use
+_init_lock = threading.Lock()
 
 
 def _ensure_env():
@@ -17,12 +30,207 @@ def _ensure_env():
     load_dotenv()
 
 
+# ---------------------------------------------------------------------------
+# HTTP transport
+# ---------------------------------------------------------------------------
+
+class _PoolStats:
+    """Cumulative request / connection counters shared by sync and async transports."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tcp_connects = 0
+        self.tls_handshakes = 0
+
+    def incr(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def trace(self, name, info):
+        if name == "connection.connect_tcp.complete":
+            self.incr("tcp_connects")
+        elif name == "connection.start_tls.complete":
+            self.incr("tls_handshakes")
+
+    async def atrace(self, name, info):
+        self.trace(name, info)
+
+
+_pool_stats = _PoolStats()
+
+
+def _env(name, cast):
+    """Read a transport setting from the environment, falling back to constants."""
+    default = getattr(constants, name)
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    if cast is bool:
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    return cast(raw)
+
+
+def get_transport_config():
+    """Return the effective HTTP transport settings (env overrides constants)."""
+    _ensure_env()
+    config = {
+        "base_url": _env("NOTION_BASE_URL", str).rstrip("/"),
+        "max_connections": _env("NOTION_POOL_MAX_CONNECTIONS", int),
+        "max_keepalive_connections": _env("NOTION_POOL_MAX_KEEPALIVE", int),
+        "keepalive_expiry": _env("NOTION_KEEPALIVE_EXPIRY_SECONDS", float),
+        "http2": _env("NOTION_HTTP2", bool),
+        "timeout": _env("NOTION_TIMEOUT_SECONDS", float),
+        "connect_timeout": _env("NOTION_CONNECT_TIMEOUT_SECONDS", float),
+    }
+    if config["http2"] and importlib.util.find_spec("h2") is None:
+        print("⚠️ [Client] NOTION_HTTP2 需要安裝 h2（pip install 'httpx[http2]'），改用 HTTP/1.1")
+        config["http2"] = False
+    return config
+
+
+def _build_transport(config, is_async):
+    import httpx
+
+    base = httpx.AsyncHTTPTransport if is_async else httpx.HTTPTransport
+
+    class _CountingTransport(base):
+        """Counts requests, bytes sent and new TCP/TLS connections via the httpcore trace hook."""
+
+        def handle_request(self, request):
+            _pool_stats.incr("requests")
+            metrics.incr("bytes_sent", int(request.headers.get("Content-Length", 0)))
+            request.extensions.setdefault("trace", _pool_stats.trace)
+            return super().handle_request(request)
+
+        async def handle_async_request(self, request):
+            _pool_stats.incr("requests")
+            metrics.incr("bytes_sent", int(request.headers.get("Content-Length", 0)))
+            request.extensions.setdefault("trace", _pool_stats.atrace)
+            return await super().handle_async_request(request)
+
+    limits = httpx.Limits(
+        max_connections=config["max_connections"],
+        max_keepalive_connections=config["max_keepalive_connections"],
+        keepalive_expiry=config["keepalive_expiry"],
+    )
+    return _CountingTransport(limits=limits, http2=config["http2"])
+
+
+def _build_notion_client(client_cls, http_client_cls, is_async):
+    """Construct a notion_client Client/AsyncClient on a tuned httpx client."""
+    import httpx
+
+    config = get_transport_config()
+    transport = _build_transport(config, is_async)
+    http_client = http_client_cls(transport=transport)
+    notion = client_cls(
+        client=http_client,
+        auth=os.environ.get("NOTION_TOKEN"),
+        base_url=config["base_url"],
+        notion_version=NOTION_API_VERSION,
+        timeout_ms=int(config["timeout"] * 1000),
+    )
+    # notion_client 只設定單一 timeout；另外套用較短的 connect timeout
+    notion.client.timeout = httpx.Timeout(config["timeout"], connect=config["connect_timeout"])
+    return notion
+
+
+def get_pool_stats():
+    """Return cumulative request/connection counters and a snapshot of the sync pool."""
+    stats = {
+        "requests": _pool_stats.requests,
+        "tcp_connects": _pool_stats.tcp_connects,
+        "tls_handshakes": _pool_stats.tls_handshakes,
+    }
+    for label, client in (("sync", _notion_client), ("async", _async_notion_client)):
+        pool = getattr(getattr(getattr(client, "client", None), "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            continue
+        idle = sum(1 for conn in connections if conn.is_idle())
+        stats[f"{label}_open_connections"] = len(connections)
+        stats[f"{label}_idle_connections"] = idle
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Client accessors
+# ---------------------------------------------------------------------------
+
 def get_notion_client():
     """Return a lazily-initialized Notion client singleton."""
     global _notion_client
-    if _notion_client is None:
-        _ensure_env()
-        from notion_client import Client
-        token = os.environ.get("NOTION_TOKEN")
-        _notion_client = Client(auth=token, notion_version=NOTION_API_VERSION)
+    with _init_lock:
+        if _notion_client is None:
+            _ensure_env()
+            import httpx
+            from notion_client import Client
+            _notion_client = _build_notion_client(Client, httpx.Client, is_async=False)
     return _notion_client
+
+
+def get_async_notion_client():
+    """Return a Notion AsyncClient shared by all coroutines on the running loop.
+
+    The underlying httpx.AsyncClient keeps its connection pool for reuse.
+    Run async code through run_async() so the client is closed before its
+    loop exits; a new loop then gets a fresh client.
+    """
+    global _async_loop, _async_notion_client, _async_semaphore
+    loop = asyncio.get_running_loop()
+    with _init_lock:
+        if _async_loop is not loop:
+            # A client left over from another loop cannot be closed from this one;
+            # run_async() closes it before its own loop exits.
+            _ensure_env()
+            import httpx
+            from notion_client import AsyncClient
+            _async_notion_client = _build_notion_client(AsyncClient, httpx.AsyncClient, is_async=True)
+            _async_semaphore = asyncio.Semaphore(
+                int(os.environ.get("ASYNC_MAX_IN_FLIGHT", ASYNC_MAX_IN_FLIGHT))
+            )
+            _async_loop = loop
+        return _async_notion_client
+
+
+async def close_async_notion_client():
+    """Close the running loop's AsyncClient (and its connection pool), if any."""
+    global _async_loop, _async_notion_client, _async_semaphore
+    with _init_lock:
+        if _async_loop is not asyncio.get_running_loop():
+            return
+        client = _async_notion_client
+        _async_loop = _async_notion_client = _async_semaphore = None
+    await client.aclose()
+
+
+def run_async(coro):
+    """Run coro on a new event loop, closing that loop's AsyncClient before the loop exits."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_async_notion_client()
+
+    return asyncio.run(main())
+
+
+def get_async_semaphore():
+    """Return the semaphore bounding in-flight async Notion requests."""
+    get_async_notion_client()
+    return _async_semaphore
+
+
+def get_rate_limiter():
+    """Return the process-wide Notion rate limiter shared by all threads.
+
+    Rate can be overridden with the NOTION_REQUESTS_PER_SECOND env var.
+    """
+    global _rate_limiter
+    with _init_lock:
+        if _rate_limiter is None:
+            _ensure_env()
+            rate = float(os.environ.get("NOTION_REQUESTS_PER_SECOND", NOTION_REQUESTS_PER_SECOND))
+            _rate_limiter = RateLimiter(rate)
+    return _rate_limiter
@@ -4,20 +4,68 @@ from datetime import timezone, timedelta
 
 # Notion API limits
 NOTION_RICH_TEXT_LIMIT = 2000
+NOTION_RICH_TEXT_ARRAY_LIMIT = 100
 NOTION_API_BATCH_SIZE = 100
+NOTION_MAX_NESTING_DEPTH = 2           # 單一請求最多兩層巢狀 children
+NOTION_REQUEST_BLOCK_LIMIT = 1000      # 單一請求最多 1000 個 blocks（含巢狀）
+NOTION_REQUEST_PAYLOAD_LIMIT = 500_000  # 單一請求 body 上限（bytes）
+NOTION_URL_LIMIT = 2000
 
 # Fallback / chunking
 FALLBACK_CHUNK_SIZE = 1900
 
-# Throttling
-PAGE_DELAY_SECONDS = 5
+# Throttling (Notion 平均限制約 3 requests/second)
+NOTION_REQUESTS_PER_SECOND = 3
+PUBLISH_CONCURRENCY = 3
+ASYNC_MAX_IN_FLIGHT = 10
+BULK_STATUS_WORKERS = 8
+
+# Retry（notion_api.call_notion）
+NOTION_MAX_RETRIES = 5
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+
+# Block tree fetching (get_block_tree)
+TREE_FETCH_WORKERS = 4
+TREE_FETCH_REQUEST_BUDGET = 500
+
+# Reverse sync (notion_exporter)
+EXPORT_WORKERS = 4
 
 # Notion
 NOTION_API_VERSION = "2022-06-28"
+NOTION_BASE_URL = "https://api.notion.com"  # 可用環境變數覆寫（例如指向本機 fake server 做 benchmark）
+
+# HTTP transport（可用同名環境變數覆寫）
+NOTION_POOL_MAX_CONNECTIONS = 20
+NOTION_POOL_MAX_KEEPALIVE = 10
+NOTION_KEEPALIVE_EXPIRY_SECONDS = 30.0
+NOTION_HTTP2 = False
+NOTION_TIMEOUT_SECONDS = 60.0
+NOTION_CONNECT_TIMEOUT_SECONDS = 10.0
 
 # File paths
 NOTES_DIR = "notes"
 DRAFTS_DIR = "drafts"
+PUBLISH_MANIFEST_PATH = f"{NOTES_DIR}/.publish-manifest.json"
+QUERY_WATERMARK_PATH = f"{NOTES_DIR}/.query-watermark.json"
+# VitePress config 讀取的側邊欄 manifest
+NAV_MANIFEST_PATH = f"{NOTES_DIR}/.vitepress/sidebar.json"
+DEDUP_INDEX_PATH = f"{NOTES_DIR}/.dedup-index.json"
+# 超過此大小的 draft 以 mmap 讀取（draft_ingest.read_draft）
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+# 本機快取（不進版控）
+CACHE_DIR = ".cache"
+SEARCH_INDEX_PATH = f"{CACHE_DIR}/search-index.sqlite3"
+CONVERSION_CACHE_DIR = f"{CACHE_DIR}/conversions"
+# dedup_index 的 mtime / size 快速比對（本機檔案狀態，不寫進 notes/.dedup-index.json）
+DEDUP_STAT_CACHE_PATH = f"{CACHE_DIR}/dedup-stat.json"
+# conversion cache 總大小上限，超過時淘汰最久未使用的項目
+CONVERSION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Near-duplicate detection（dedup_index）
+# draft 與既有筆記的估計 Jaccard 相似度達此值即視為近似重複
+DEDUP_THRESHOLD = 0.7
 
 # Timezone
 TW_TIMEZONE = timezone(timedelta(hours=8))
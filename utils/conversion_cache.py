@@ -0,0 +1,233 @@
+"""Content-addressed on-disk cache for Markdown → Notion block conversion.
+
+以 sha256(converter 版本 + converter 原始碼 hash + mistune 版本 + for_notion + Markdown 內容) 為 key，
+將轉換結果存成 zlib 壓縮的 JSON lines（.cache/conversions/{key}.jsonl.z，每行一個 block），
+讀寫都是串流：命中與未命中時記憶體都只需持有一個 block，可以邊轉換（或讀取）邊上傳。
+同一份內容重新同步、dry-run、rollback 後重試時直接讀取，不必重新 parse。
+總大小超過上限時依最後使用時間（mtime，命中時更新）淘汰最舊的項目。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from itertools import islice
+
+import mistune
+
+import md_to_notion
+import metrics
+import notion_languages
+from constants import CONVERSION_CACHE_DIR, CONVERSION_CACHE_MAX_BYTES
+from md_to_notion import CONVERTER_VERSION, iter_notion_blocks
+
+_SUFFIX = ".jsonl.z"
+# 淘汰時也算入舊格式（整份 JSON）的項目，讓它們依 LRU 被清掉
+_EVICTABLE_SUFFIXES = (_SUFFIX, ".json.z")
+_READ_CHUNK_BYTES = 64 * 1024
+# 淘汰時清到上限的此比例以下，避免每次寫入都觸發掃描
+_EVICT_TARGET = 0.8
+
+
+def _source_hash(*modules):
+    # 轉換器原始碼有任何修改（即使忘了調 CONVERTER_VERSION）都會換一組 key
+    h = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+_SOURCE_HASH = _source_hash(md_to_notion, notion_languages)
+
+_enabled = True
+_lock = threading.Lock()
+# 快取目錄目前的總 bytes（第一次寫入時掃描目錄取得）
+_size = None
+
+
+def set_enabled(enabled):
+    """開關 conversion cache（對應 --no-cache）；關閉時一律重新轉換且不寫入。"""
+    global _enabled
+    _enabled = enabled
+
+
+def cache_key(markdown_text, for_notion=False):
+    h = hashlib.sha256()
+    h.update(f"{CONVERTER_VERSION}\0{_SOURCE_HASH}\0{mistune.__version__}\0{int(for_notion)}\0".encode("utf-8"))
+    h.update(markdown_text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _path(key):
+    return os.path.join(CONVERSION_CACHE_DIR, key + _SUFFIX)
+
+
+def _open_entry(key):
+    """開啟快取項目並更新最後使用時間（LRU）；未命中回傳 None"""
+    path = _path(key)
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return f
+
+
+def _read_blocks(f):
+    """逐塊解壓、逐行 yield block，一次只持有一個 chunk；項目不完整時拋出 ValueError"""
+    decompressor = zlib.decompressobj()
+    pending = b""
+    while chunk := f.read(_READ_CHUNK_BYTES):
+        pending += decompressor.decompress(chunk)
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield json.loads(line)
+    if not decompressor.eof or pending:
+        raise ValueError("conversion cache 項目不完整")
+
+
+def _entries():
+    entries = []
+    with os.scandir(CONVERSION_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(_EVICTABLE_SUFFIXES):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def _evict():
+    # 呼叫端需持有 _lock
+    global _size
+    entries = sorted(_entries())
+    _size = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if _size <= CONVERSION_CACHE_MAX_BYTES * _EVICT_TARGET:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        _size -= size
+
+
+def _account(added_bytes):
+    global _size
+    with _lock:
+        if _size is None:
+            _size = sum(size for _, size, _ in _entries())
+        else:
+            _size += added_bytes
+        if _size > CONVERSION_CACHE_MAX_BYTES:
+            _evict()
+
+
+class _EntryWriter:
+    """邊轉換邊把 blocks 壓縮寫入暫存檔，完整跑完才 rename 成快取項目。
+
+    寫入失敗（例如磁碟已滿）只放棄這次的快取，不影響轉換結果。
+    """
+
+    def __init__(self, key):
+        self.path = _path(key)
+        self.tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._compressor = zlib.compressobj()
+        self._size = 0
+        self._file = None
+        try:
+            os.makedirs(CONVERSION_CACHE_DIR, exist_ok=True)
+            self._file = open(self.tmp_path, "wb")
+        except OSError as e:
+            print(f"⚠️ [Cache] 無法寫入 conversion cache: {e}")
+
+    def _write(self, data):
+        if self._file is None:
+            return
+        try:
+            self._size += self._file.write(data)
+        except OSError as e:
+            print(f"⚠️ [Cache] 無法寫入 conversion cache: {e}")
+            self.abort()
+
+    def add(self, block):
+        line = json.dumps(block, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self._write(self._compressor.compress(line.encode("utf-8")))
+
+    def commit(self):
+        self._write(self._compressor.flush())
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+            os.replace(self.tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ [Cache] 無法寫入 conversion cache: {e}")
+            self.abort()
+            return
+        self._file = None
+        _account(self._size)
+
+    def abort(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def iter_cached_blocks(markdown_text, for_notion=False):
+    """iter_notion_blocks 的快取版本，命中與未命中都逐一 yield，記憶體只需一個 block。
+
+    命中時逐行解壓快取項目；未命中時照常邊轉換邊 yield，同時壓縮寫入暫存檔，
+    轉換完整跑完後才 rename 成快取項目（呼叫端中途停止或轉換出錯時捨棄）。
+    """
+    if not _enabled:
+        yield from iter_notion_blocks(markdown_text, for_notion=for_notion)
+        return
+
+    key = cache_key(markdown_text, for_notion)
+    f = _open_entry(key)
+    if f is not None:
+        metrics.incr("convert_cache.hits")
+        yielded = 0
+        with f:
+            try:
+                for block in _read_blocks(f):
+                    yield block
+                    yielded += 1
+                return
+            except (OSError, zlib.error, ValueError):
+                pass
+        # 損壞的項目：刪除，並從中斷處改為重新轉換（轉換結果是確定的，前面的 blocks 相同）
+        print(f"⚠️ [Cache] conversion cache 項目損壞，改為重新轉換: {_path(key)}")
+        try:
+            os.remove(_path(key))
+        except OSError:
+            pass
+        yield from islice(iter_notion_blocks(markdown_text, for_notion=for_notion), yielded, None)
+        return
+
+    metrics.incr("convert_cache.misses")
+    writer = _EntryWriter(key)
+    try:
+        for block in iter_notion_blocks(markdown_text, for_notion=for_notion):
+            writer.add(block)
+            yield block
+    except BaseException:
+        # 包含呼叫端中途 close()（GeneratorExit）：不留下不完整的項目
+        writer.abort()
+        raise
+    writer.commit()
+
+
+def cached_notion_blocks(markdown_text, for_notion=False):
+    """markdown_to_notion_blocks 的快取版本，回傳 block list"""
+    return list(iter_cached_blocks(markdown_text, for_notion=for_notion))
@@ -0,0 +1,340 @@
+"""Near-duplicate detection for drafts and notes (MinHash + LSH).
+
+每篇筆記以 md_to_notion 的 AST 取出純文字，沿用 search_index 的 tokenize（中文 bigram），
+以連續 SHINGLE_SIZE 個 token 為 shingle 計算 MinHash signature
+（one permutation hashing：每個 shingle 只 hash 一次並分到 NUM_PERM 個 bin 取最小值，
+空 bin 以右側最近的非空 bin 補值），
+再切成 LSH_BANDS 個 band 建立 bucket：查詢時只比對落在同一 bucket 的候選筆記，
+不必與每篇筆記逐一比較。signature 與內容 hash 存在 notes/.dedup-index.json（進版控），
+筆記發布時只更新記憶體中的索引，由 save() 在每次執行結束時寫入一次；
+每次查詢前同步手動改過的筆記（未寫入的變更也會在下次 refresh 時補上）。
+mtime / size 只記在本機的 .cache/dedup-stat.json，用來跳過未變動的筆記，
+不同時再以內容 hash 確認，因此 checkout 後 mtime 改變不會讓 index 檔案跟著變動。
+"""
+
+import base64
+import glob
+import hashlib
+import json
+import os
+import struct
+import threading
+from collections import defaultdict
+
+from constants import DEDUP_INDEX_PATH, DEDUP_STAT_CACHE_PATH, NOTES_DIR
+from md_to_notion import markdown_plain_text
+from notes_layout import strip_updated_note
+from search_index import tokenize
+
+DEDUP_INDEX_VERSION = 2
+
+NUM_PERM = 128
+# 32 個 band × 每 band 4 列：相似度約 0.42 以上的筆記就很可能成為候選，再以 signature 估計值篩選
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 5
+
+_BIN_BITS = (NUM_PERM - 1).bit_length()
+_MAX_HASH = (1 << 32) - 1
+# 空 bin 借用距離 d 的 bin 時加上 d·_DENSIFY_OFFSET，讓不同距離借來的值不會誤判為相同
+_DENSIFY_OFFSET = 0x9E3779B1
+# signature 序列化格式：NUM_PERM 個 little-endian uint32（與平台無關）
+_SIG_STRUCT = struct.Struct(f"<{NUM_PERM}I")
+
+# Module-level cache (populated on first access); guarded for worker threads
+_index = None
+_buckets = None
+_stats = None
+_dirty = False
+_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# MinHash
+# ---------------------------------------------------------------------------
+
+def plain_text(markdown_text):
+    """以 AST 取出筆記純文字（忽略 Markdown 語法與 Updated 註記）"""
+    return markdown_plain_text(strip_updated_note(markdown_text))
+
+
+def _shingle_hashes(text):
+    tokens = tokenize(text)
+    if not tokens:
+        return set()
+    count = max(1, len(tokens) - SHINGLE_SIZE + 1)
+    return {
+        int.from_bytes(hashlib.blake2b("\x1f".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8"),
+                                       digest_size=8).digest())
+        for i in range(count)
+    }
+
+
+def signature(markdown_text):
+    """回傳 NUM_PERM 個 32-bit MinHash 值的 tuple；沒有任何文字時回傳 None。"""
+    hashes = _shingle_hashes(plain_text(markdown_text))
+    if not hashes:
+        return None
+    bins = [None] * NUM_PERM
+    for h in hashes:
+        index = h & (NUM_PERM - 1)
+        value = (h >> _BIN_BITS) & _MAX_HASH
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    # densification：空 bin 取右側（循環）最近的非空 bin
+    sig = []
+    for index in range(NUM_PERM):
+        distance = 0
+        while bins[(index + distance) % NUM_PERM] is None:
+            distance += 1
+        sig.append((bins[(index + distance) % NUM_PERM] + distance * _DENSIFY_OFFSET) & _MAX_HASH)
+    return tuple(sig)
+
+
+def similarity(sig_a, sig_b):
+    """以兩個 signature 中相同位置相等的比例估計 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def _bands(sig):
+    return [(band, sig[band * LSH_ROWS:(band + 1) * LSH_ROWS]) for band in range(LSH_BANDS)]
+
+
+def _encode(sig):
+    return base64.b64encode(_SIG_STRUCT.pack(*sig)).decode("ascii")
+
+
+def _decode(data):
+    return _SIG_STRUCT.unpack(base64.b64decode(data))
+
+
+# ---------------------------------------------------------------------------
+# Persisted index
+# ---------------------------------------------------------------------------
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    """原子寫入（先寫暫存檔再 rename），避免中斷時留下半份 JSON。"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def _load():
+    global _index, _buckets, _stats
+    if _index is None:
+        data = _read_json(DEDUP_INDEX_PATH)
+        # 格式或 signature 參數不同時捨棄，交給 refresh() 重新計算
+        if data.get("version") == DEDUP_INDEX_VERSION and data.get("num_perm") == NUM_PERM:
+            _index = {
+                path: dict(entry, signature=entry["signature"] and _decode(entry["signature"]))
+                for path, entry in data["notes"].items()
+            }
+        else:
+            _index = {}
+        _buckets = defaultdict(set)
+        for path, entry in _index.items():
+            if entry["signature"] is not None:
+                _add_buckets(path, entry["signature"])
+        # {path: {"mtime", "size", "hash"}}；hash 與 index 不同（例如 git pull 更新了 index）時視為失效
+        _stats = _read_json(DEDUP_STAT_CACHE_PATH).get("notes", {})
+    return _index
+
+
+def _save():
+    notes = {path: dict(entry, signature=entry["signature"] and _encode(entry["signature"]))
+             for path, entry in _index.items()}
+    _write_json(DEDUP_INDEX_PATH, {"version": DEDUP_INDEX_VERSION, "num_perm": NUM_PERM, "notes": notes})
+
+
+def _save_stats():
+    try:
+        _write_json(DEDUP_STAT_CACHE_PATH, {"notes": _stats})
+    except OSError as e:
+        # 只是加速用的本機快取，寫入失敗不影響結果
+        print(f"⚠️ [Dedup] 無法寫入 {DEDUP_STAT_CACHE_PATH}: {e}")
+
+
+def _add_buckets(path, sig):
+    for key in _bands(sig):
+        _buckets[key].add(path)
+
+
+def _remove(path):
+    # 呼叫端需持有 _lock
+    _stats.pop(path, None)
+    entry = _index.pop(path, None)
+    if entry and entry["signature"] is not None:
+        for key in _bands(entry["signature"]):
+            _buckets[key].discard(path)
+
+
+def _content_hash(markdown_text):
+    return hashlib.sha256(markdown_text.encode("utf-8")).hexdigest()
+
+
+def _record_stat(path, digest, stat):
+    # 呼叫端需持有 _lock
+    _stats[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "hash": digest}
+
+
+def _stat_unchanged(path, stat):
+    # 呼叫端需持有 _lock
+    cached = _stats.get(path)
+    return (cached is not None and cached["hash"] == _index[path]["hash"]
+            and (cached["mtime"], cached["size"]) == (stat.st_mtime, stat.st_size))
+
+
+def _put(path, sig, digest, stat):
+    # 呼叫端需持有 _lock；沒有文字的筆記也記錄 hash，避免每次 refresh 重算
+    _remove(path)
+    _index[path] = {"signature": sig, "hash": digest}
+    _record_stat(path, digest, stat)
+    if sig is not None:
+        _add_buckets(path, sig)
+
+
+def record_note(note_file, markdown_text):
+    """將剛寫入的筆記加入（或更新）索引；由 save() 統一落盤。"""
+    global _dirty
+    sig = signature(markdown_text)
+    with _lock:
+        _load()
+        _put(note_file, sig, _content_hash(markdown_text), os.stat(note_file))
+        _dirty = True
+
+
+def remove_note(note_file):
+    """從索引移除筆記（例如發布失敗 rollback 時）；由 save() 統一落盤。"""
+    global _dirty
+    with _lock:
+        _load()
+        _remove(note_file)
+        _dirty = True
+
+
+def save():
+    """將 record_note / remove_note 累積的變更寫入索引檔（每次執行結束時呼叫一次）。"""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        _save()
+        _save_stats()
+        _dirty = False
+
+
+def refresh(notes_dir=NOTES_DIR):
+    """同步 notes/：新增或修改過的筆記重新計算 signature，刪除的筆記移除。
+
+    mtime / size 與本機快取相同的筆記直接跳過；不同時再比對內容 hash
+    （例如 git checkout 後 mtime 全變），內容未變只更新本機快取。
+    回傳 {"indexed", "removed"}；index 有變動時才寫入 notes/.dedup-index.json。
+    """
+    current = {path: os.stat(path) for path in glob.glob(os.path.join(notes_dir, "*", "*.md"))}
+    with _lock:
+        index = _load()
+        changed = {
+            path: index.get(path) for path, stat in current.items()
+            if path not in index or not _stat_unchanged(path, stat)
+        }
+        removed = [path for path in index if path not in current]
+
+    updates = {}
+    for path, entry in changed.items():
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        digest = _content_hash(content)
+        sig = entry["signature"] if entry and entry["hash"] == digest else signature(content)
+        updates[path] = (sig, digest, entry is None or entry["hash"] != digest)
+
+    with _lock:
+        for path in removed:
+            _remove(path)
+        for path, (sig, digest, reindexed) in updates.items():
+            if reindexed:
+                _put(path, sig, digest, current[path])
+            else:
+                _record_stat(path, digest, current[path])
+        if removed or any(reindexed for _, _, reindexed in updates.values()):
+            _save()
+        if changed or removed:
+            _save_stats()
+    return {"indexed": sum(reindexed for _, _, reindexed in updates.values()), "removed": len(removed)}
+
+
+def _candidates(sig, buckets):
+    candidates = set()
+    for key in _bands(sig):
+        candidates |= buckets.get(key, set())
+    return candidates
+
+
+def query(sig, threshold, exclude=()):
+    """回傳與 sig 估計相似度 ≥ threshold 的筆記 [(path, 相似度)]，依相似度遞減。
+
+    只比對 LSH bucket 中的候選筆記。
+    """
+    if sig is None:
+        return []
+    with _lock:
+        index = _load()
+        matches = [
+            (path, similarity(sig, index[path]["signature"]))
+            for path in _candidates(sig, _buckets) - set(exclude)
+        ]
+    return sorted(((path, score) for path, score in matches if score >= threshold),
+                  key=lambda item: -item[1])
+
+
+def find_duplicates(drafts, threshold, exclude=None):
+    """檢查多份 draft 是否與既有筆記或同批先前的 draft 近似重複。
+
+    drafts: {key: markdown 正文}（依處理順序）
+    exclude: {key: 要忽略的筆記路徑}，例如同標題 draft 對應的既有筆記（屬於更新而非重複）
+    回傳 {key: [(筆記路徑或 draft key, 相似度)]}，只包含有找到重複的 draft。
+
+    同批 draft 依序加入暫時的 LSH bucket，只與同 bucket 的候選比對。
+    已與同批先前 draft 重複的 draft 不再加入 bucket（由先前那份代表整群），
+    因此大量近乎相同的 drafts 不會退化成兩兩比對。
+    """
+    exclude = exclude or {}
+    batch = defaultdict(set)
+    batch_signatures = {}
+    duplicates = {}
+    for key, body in drafts.items():
+        sig = signature(body)
+        if sig is None:
+            continue
+        matches = query(sig, threshold, exclude=[exclude[key]] if key in exclude else ())
+        batch_matches = [(other, score) for other in _candidates(sig, batch)
+                         if (score := similarity(sig, batch_signatures[other])) >= threshold]
+        if matches or batch_matches:
+            duplicates[key] = sorted(matches + batch_matches, key=lambda item: -item[1])
+        if batch_matches:
+            continue
+        batch_signatures[key] = sig
+        for band in _bands(sig):
+            batch[band].add(key)
+    return duplicates
+
+
+def duplicate_pairs(threshold):
+    """列出索引中彼此近似重複的筆記 [(path_a, path_b, 相似度)]，依相似度遞減。"""
+    with _lock:
+        signatures = {path: entry["signature"] for path, entry in _load().items()
+                      if entry["signature"] is not None}
+    pairs = {}
+    for path, sig in signatures.items():
+        for other, score in query(sig, threshold, exclude=[path]):
+            pairs[tuple(sorted((path, other)))] = score
+    return sorted(((a, b, score) for (a, b), score in pairs.items()), key=lambda item: -item[2])
@@ -0,0 +1,94 @@
+"""Single-read Markdown ingestion with a line-anchored frontmatter splitter.
+
+以行為單位尋找 YAML frontmatter 的開頭與結尾 fence（獨佔一行的 ---），
+YAML 值或正文中出現的 ---（分隔線、表格）不會被誤判。
+檔案只讀取一次（大檔以 mmap 對應），正文直接從 buffer 的 offset 解碼成 str，
+不先切出中間字串。draft_publisher 與 tools/test_md_convert.py 共用。
+"""
+
+import mmap
+import os
+import re
+
+from constants import MMAP_THRESHOLD_BYTES
+
+_BOM = b"\xef\xbb\xbf"
+# 開頭 fence：檔案第一行（允許行尾空白與 CRLF）
+_OPEN_RE = re.compile(rb"---[ \t]*(?:\r?\n|\Z)")
+# 結尾 fence：之後任一獨佔一行的 ---
+_CLOSE_RE = re.compile(rb"^---[ \t]*\r?$\n?", re.MULTILINE)
+_OPEN_STR_RE = re.compile(_OPEN_RE.pattern.decode())
+_CLOSE_STR_RE = re.compile(_CLOSE_RE.pattern.decode(), re.MULTILINE)
+
+
+class UnclosedFrontmatter(ValueError):
+    """檔案以 --- 開頭，但找不到結尾的 --- 行。"""
+
+
+def frontmatter_span(buf):
+    """找出 frontmatter 在 buf（bytes、mmap 或 str）中的位置。
+
+    回傳 (yaml_start, yaml_end, body_start)；沒有開頭 fence 時回傳 None。
+    body_start 已略過正文開頭的空行。開頭 fence 未關閉時拋出 UnclosedFrontmatter。
+    """
+    is_text = isinstance(buf, str)
+    start = 0
+    if is_text and buf.startswith("\ufeff"):
+        start = 1
+    elif not is_text and buf[:3] == _BOM:
+        start = 3
+
+    opening = (_OPEN_STR_RE if is_text else _OPEN_RE).match(buf, start)
+    if not opening:
+        return None
+    closing = (_CLOSE_STR_RE if is_text else _CLOSE_RE).search(buf, opening.end())
+    if not closing:
+        raise UnclosedFrontmatter("YAML frontmatter 缺少結尾的 ---")
+
+    body_start = closing.end()
+    newlines = ("\n", "\r") if is_text else (b"\n", b"\r")
+    while buf[body_start:body_start + 1] in newlines:
+        body_start += 1
+    return opening.end(), closing.start(), body_start
+
+
+def _split(buf, strict):
+    try:
+        span = frontmatter_span(buf)
+    except UnclosedFrontmatter:
+        if strict:
+            raise
+        span = None
+    if span is None:
+        return None, 0
+    yaml_start, yaml_end, body_start = span
+    with memoryview(buf) as view:
+        return str(view[yaml_start:yaml_end], "utf-8"), body_start
+
+
+def read_draft(file_path, strict=True):
+    """讀取 Markdown 檔案，回傳 (raw_yaml, body)；沒有 frontmatter 時 raw_yaml 為 None。
+
+    超過 MMAP_THRESHOLD_BYTES 的檔案以 mmap 讀取。正文從 fence 之後的 offset 直接解碼。
+    strict=False 時，未關閉的 frontmatter 視為沒有 frontmatter（整份檔案都是正文）。
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD_BYTES:
+            buf = f.read()
+            raw_yaml, body_start = _split(buf, strict)
+            with memoryview(buf) as view:
+                return raw_yaml, str(view[body_start:], "utf-8")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            raw_yaml, body_start = _split(mm, strict)
+            with memoryview(mm) as view:
+                return raw_yaml, str(view[body_start:], "utf-8")
+
+
+def strip_frontmatter(text):
+    """剝離 str 開頭的 YAML frontmatter 並回傳正文；沒有或未關閉時原樣回傳。"""
+    try:
+        span = frontmatter_span(text)
+    except UnclosedFrontmatter:
+        return text
+    return text if span is None else text[span[2]:]
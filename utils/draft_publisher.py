@@ -1,27 +1,65 @@
 """Publish markdown drafts from drafts/ to Notion and notes/."""
 
+import argparse
 import glob
 import os
 import shutil
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import chain, islice
 from dotenv import load_dotenv
 import yaml
+from notion_client.errors import APIErrorCode, APIResponseError
 
+import conversion_cache
+import dedup_index
+import metrics
 from categories import CATEGORIES
-from clients import get_notion_client  # noqa: F401 – ensures env is loaded
+from clients import get_notion_client, get_pool_stats, get_rate_limiter  # noqa: F401 – ensures env is loaded
 from constants import (
+    DEDUP_THRESHOLD,
     DRAFTS_DIR,
-    NOTES_DIR,
-    PAGE_DELAY_SECONDS,
+    PUBLISH_CONCURRENCY,
     TW_TIMEZONE,
 )
 from datetime import datetime
-from md_to_notion import markdown_to_notion_blocks, _sanitize_mermaid_in_markdown
-from notion_writer import create_page_in_database, update_page_status
+from draft_ingest import UnclosedFrontmatter, read_draft
+from md_to_notion import _sanitize_mermaid_in_markdown
+from nav_manifest import record_note, remove_note
+from notes_layout import FALLBACK_CATEGORY, insert_updated_note, note_path
+from notion_reader import count_child_blocks
+from notion_writer import (
+    append_blocks_batched,
+    create_page_in_database,
+    update_page_in_database,
+    update_page_status,
+)
+from publish_manifest import content_hash, get_entry, is_complete, record_checkpoint, record_publish
+from publish_planner import format_plan, plan_page
+
+# libyaml 的 C loader 快很多；未編譯 libyaml 時退回純 Python 版本
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class FrontmatterError(ValueError):
+    """Draft 的 frontmatter 缺少、格式錯誤或缺少必要欄位。"""
+
+    def __init__(self, file_path, message):
+        super().__init__(f"{message}: {file_path}")
+        self.file_path = file_path
+        self.message = message
 
-FALLBACK_CATEGORY = "99-Inbox"
-STATUS_UPDATE_MAX_RETRIES = 2
+
+class ConfigError(RuntimeError):
+    """發布所需的環境設定缺少或無效（例如 NOTION_DATABASE_ID）。"""
+
+
+def _database_id():
+    database_id = os.environ.get("NOTION_DATABASE_ID")
+    if not database_id:
+        raise ConfigError("缺少 NOTION_DATABASE_ID 環境變數")
+    return database_id
 
 
 def _ensure_env():
@@ -37,38 +75,27 @@ def parse_frontmatter(file_path):
     """讀取 markdown 檔案，分離 YAML frontmatter 和正文。
 
     回傳 (metadata dict, body str)。
-    驗證必要欄位：title, category, tags。
+    驗證必要欄位：title, category, tags；不合格時拋出 FrontmatterError。
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    if not content.startswith("---"):
-        print(f"❌ [Parse] 缺少 YAML frontmatter: {file_path}")
-        sys.exit(1)
-
-    parts = content.split("---", 2)
-    if len(parts) < 3:
-        print(f"❌ [Parse] YAML frontmatter 格式錯誤: {file_path}")
-        sys.exit(1)
-
-    raw_yaml = parts[1]
-    body = parts[2].lstrip("\n")
+    try:
+        raw_yaml, body = read_draft(file_path)
+    except UnclosedFrontmatter as e:
+        raise FrontmatterError(file_path, "YAML frontmatter 格式錯誤（找不到結尾的 ---）") from e
+    if raw_yaml is None:
+        raise FrontmatterError(file_path, "缺少 YAML frontmatter")
 
     try:
-        metadata = yaml.safe_load(raw_yaml)
+        metadata = yaml.load(raw_yaml, Loader=_YAML_LOADER)
     except yaml.YAMLError as e:
-        print(f"❌ [Parse] YAML 解析失敗: {file_path}\n{e}")
-        sys.exit(1)
+        raise FrontmatterError(file_path, f"YAML 解析失敗（{e}）") from e
 
     if not metadata or not isinstance(metadata, dict):
-        print(f"❌ [Parse] YAML 內容無效: {file_path}")
-        sys.exit(1)
+        raise FrontmatterError(file_path, "YAML 內容無效")
 
     # 驗證必要欄位
     for field in ("title", "category", "tags"):
         if field not in metadata:
-            print(f"❌ [Parse] 缺少必要欄位 '{field}': {file_path}")
-            sys.exit(1)
+            raise FrontmatterError(file_path, f"缺少必要欄位 '{field}'")
 
     # tags 若為 string 自動轉 list
     if isinstance(metadata["tags"], str):
@@ -82,6 +109,72 @@ def parse_frontmatter(file_path):
     return metadata, body
 
 
+def _parse_or_error(file_path):
+    """ProcessPool worker：回傳 (file_path, (metadata, body), None) 或 (file_path, None, 錯誤訊息)"""
+    try:
+        return file_path, parse_frontmatter(file_path), None
+    except FrontmatterError as e:
+        return file_path, None, e.message
+    except (OSError, UnicodeDecodeError) as e:
+        return file_path, None, f"無法讀取（{e}）"
+
+
+def validate_drafts(drafts, max_workers=None):
+    """以 process pool 並行解析所有 drafts 的 frontmatter。
+
+    回傳 (valid, errors)：
+      valid: {file_path: (metadata, body)}，依 drafts 順序
+      errors: {file_path: 錯誤訊息}
+    標題重複的 draft 也視為錯誤（會寫到同一個 Notion 頁面與 manifest entry）。
+    """
+    max_workers = max_workers or min(len(drafts), os.cpu_count() or 1)
+    if max_workers <= 1:
+        results = [_parse_or_error(path) for path in drafts]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_parse_or_error, drafts, chunksize=8))
+
+    valid, errors, seen_titles = {}, {}, {}
+    for file_path, parsed, error in results:
+        if error:
+            errors[file_path] = error
+            continue
+        title = parsed[0]["title"]
+        if title in seen_titles:
+            errors[file_path] = f"標題與 {seen_titles[title]} 重複"
+            continue
+        seen_titles[title] = file_path
+        valid[file_path] = parsed
+    return valid, errors
+
+
+def check_duplicates(drafts, threshold=DEDUP_THRESHOLD):
+    """發布前以 dedup index 比對 drafts（不呼叫任何 API），回傳 {file_path: [(相似筆記, 相似度)]}。
+
+    drafts 為 validate_drafts 回傳的 {file_path: (metadata, body)}。
+    同標題 draft 對應的既有筆記屬於更新，不視為重複；同批 drafts 之間也會互相比對。
+    """
+    with metrics.span("dedup_check"):
+        dedup_index.refresh()
+        duplicates = dedup_index.find_duplicates(
+            {path: body for path, (_, body) in drafts.items()},
+            threshold,
+            exclude={path: note_path(metadata["category"], metadata["title"])
+                     for path, (metadata, _) in drafts.items()},
+        )
+    for file_path, matches in duplicates.items():
+        print(f"⚠️ [Dedup] {file_path} 與以下內容近似重複：")
+        for other, score in matches:
+            print(f"  - {score:.0%} {other}")
+    return duplicates
+
+
+def _report_invalid(errors):
+    print(f"❌ [Validate] {len(errors)} 個 draft 無法發布：")
+    for file_path, message in errors.items():
+        print(f"  - {file_path}: {message}")
+
+
 # ---------------------------------------------------------------------------
 # File operations
 # ---------------------------------------------------------------------------
@@ -92,19 +185,12 @@ def move_draft_to_notes(source_path, body, category, title):
     回傳目標檔案路徑。
     """
     # 確保分類資料夾存在
-    category_dir = f"{NOTES_DIR}/{category}"
-    os.makedirs(category_dir, exist_ok=True)
-
-    # 安全標題
-    safe_title = title.replace("/", "-").replace("\\", "-")
-    dest_path = f"{category_dir}/{safe_title}.md"
+    dest_path = note_path(category, title)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
     # 在 H1 標題後插入 Updated Time 註記
     now = datetime.now(TW_TIMEZONE).strftime("%Y-%m-%d %H:%M")
-    content_lines = body.split("\n")
-    if content_lines and content_lines[0].startswith("# "):
-        content_lines.insert(1, f"\n> Updated: {now}\n")
-    md_content = "\n".join(content_lines)
+    md_content = insert_updated_note(body, now)
 
     # Sanitize Mermaid 區塊
     md_content = _sanitize_mermaid_in_markdown(md_content)
@@ -116,6 +202,10 @@ def move_draft_to_notes(source_path, body, category, title):
     # 刪除來源檔案
     os.remove(source_path)
 
+    # 增量更新 VitePress 側邊欄 manifest 與近似重複索引
+    record_note(dest_path, now)
+    dedup_index.record_note(dest_path, md_content)
+
     print(f"💾 [File] {source_path} → {dest_path}")
     return dest_path
 
@@ -124,60 +214,144 @@ def move_draft_to_notes(source_path, body, category, title):
 # Single draft pipeline
 # ---------------------------------------------------------------------------
 
-def process_single_draft(file_path):
-    """處理單一 draft 檔案的完整 pipeline。"""
-    database_id = os.environ.get("NOTION_DATABASE_ID")
-    if not database_id:
-        print("❌ [Config] 缺少 NOTION_DATABASE_ID 環境變數")
-        sys.exit(1)
+def _build_content_blocks(body):
+    """Markdown → Notion blocks generator，並在頁面最頂端插入 TOC block。
+
+    以 generator 串接，建立頁面時可邊轉換邊上傳；內容未變的 body 直接讀取 conversion cache。
+    每個 batch 在送出前才轉換完成，converter 在第一個 batch 之後出錯時頁面只會寫入前面的 batches，
+    publish_manifest 已記錄到最後一個成功的 checkpoint，修正後重新執行即從該處續傳。
+    """
+    toc_block = {
+        "object": "block",
+        "type": "table_of_contents",
+        "table_of_contents": {"color": "default"},
+    }
+    return chain([toc_block], metrics.timed_iter(
+        conversion_cache.iter_cached_blocks(body, for_notion=True), "convert"))
+
+
+def _publish_action(entry, digest):
+    """依 manifest 決定發布方式：skip（內容未變更）、resume（checkpoint 續傳）、update（diff 同步）或 create"""
+    if entry and entry["hash"] == digest:
+        return "skip" if is_complete(entry) else "resume"
+    return "update" if entry else "create"
+
+
+def _checkpoint_matches(entry):
+    """續傳前讀回頁面的頂層 block 數，與 checkpoint 相同才可從該處 append。"""
+    page_id, offset = entry["page_id"], entry["checkpoint"]
+    try:
+        with metrics.span("resume_check"):
+            written = count_child_blocks(page_id)
+    except APIResponseError as e:
+        if e.code != APIErrorCode.ObjectNotFound:
+            raise
+        print(f"⚠️ [Checkpoint] 頁面已不存在: {page_id}")
+        return False
+    if written != offset:
+        print(f"⚠️ [Checkpoint] 頁面有 {written} 個 block，與 checkpoint 的 {offset} 不符，改以 diff 同步: {page_id}")
+        return False
+    return True
+
+
+def process_single_draft(file_path, parsed=None):
+    """處理單一 draft 檔案的完整 pipeline。
+
+    parsed 為 validate_drafts 已解析的 (metadata, body)；未提供時重新解析。
+    設定缺少時拋出 ConfigError（在 worker thread 中執行，不可直接 sys.exit）。
+    """
+    database_id = _database_id()
 
     # 1. Parse frontmatter
-    metadata, body = parse_frontmatter(file_path)
+    if parsed is None:
+        with metrics.span("parse_frontmatter"):
+            parsed = parse_frontmatter(file_path)
+    metadata, body = parsed
     title = metadata["title"]
     category = metadata["category"]
     tags = metadata["tags"]
     print(f"📄 [Draft] 處理: {title} ({category})")
 
-    # 2. Markdown → Notion blocks
-    content_blocks = markdown_to_notion_blocks(body, for_notion=True)
-
-    # 插入 TOC block 到頁面最頂端
-    toc_block = {
-        "object": "block",
-        "type": "table_of_contents",
-        "table_of_contents": {"color": "default"},
-    }
-    content_blocks.insert(0, toc_block)
-
-    # 3. 建立 Notion page（Status: Draft）
-    page_id = create_page_in_database(
-        database_id=database_id,
-        title=title,
-        category=category,
-        tags=tags,
-        children=content_blocks,
-    )
+    # 2. 查 manifest：內容未變更就沿用既有頁面，跳過轉換與上傳；
+    #    上次上傳中斷則從 checkpoint 續傳
+    with metrics.span("manifest_lookup"):
+        digest = content_hash(metadata, body)
+        entry = get_entry(title)
+        action = _publish_action(entry, digest)
+
+    def checkpoint(page_id, offset):
+        record_checkpoint(title, digest, page_id, offset)
+
+    if action == "resume" and not _checkpoint_matches(entry):
+        # 頁面已被改動（例如未記錄到 checkpoint 的 batch 其實已寫入、或手動編輯），改以 diff 同步
+        action = "update"
+
+    if action == "skip":
+        page_id = entry["page_id"]
+        print(f"⏭️ [Manifest] 內容未變更，沿用既有頁面: {page_id}")
+    elif action == "resume":
+        page_id = entry["page_id"]
+        offset = entry["checkpoint"]
+        print(f"⏯️ [Checkpoint] 從第 {offset} 個 block 續傳: {page_id}")
+        with metrics.span("resume_upload"):
+            append_blocks_batched(
+                page_id,
+                islice(_build_content_blocks(body), offset, None),
+                start_offset=offset,
+                on_progress=checkpoint,
+            )
+        record_publish(title, digest, page_id)
+    else:
+        # 3. Markdown → Notion blocks，建立或更新 Notion page（Status: Draft）
+        content_blocks = _build_content_blocks(body)
+        page_id = None
+        if action == "update":
+            try:
+                with metrics.span("update_page"):
+                    page_id = update_page_in_database(
+                        page_id=entry["page_id"],
+                        title=title,
+                        category=category,
+                        tags=tags,
+                        children=content_blocks,
+                    )
+            except APIResponseError as e:
+                if e.code != APIErrorCode.ObjectNotFound:
+                    raise
+                print(f"⚠️ [Manifest] 既有頁面已不存在，改為建立新頁面: {entry['page_id']}")
+                content_blocks = _build_content_blocks(body)
+        if page_id is None:
+            with metrics.span("create_page"):
+                page_id = create_page_in_database(
+                    database_id=database_id,
+                    title=title,
+                    category=category,
+                    tags=tags,
+                    children=content_blocks,
+                    on_progress=checkpoint,
+                )
+        record_publish(title, digest, page_id)
 
     # 4. 搬移檔案到 notes/
     dest_path = None
     try:
-        dest_path = move_draft_to_notes(file_path, body, category, title)
+        with metrics.span("move_file"):
+            dest_path = move_draft_to_notes(file_path, body, category, title)
     except Exception as e:
         print(f"⚠️ [File] 搬移失敗，Notion page 維持 Draft 狀態: {e}")
         return
 
     # 5. 更新 Notion 狀態為 Processed
-    for attempt in range(1, STATUS_UPDATE_MAX_RETRIES + 1):
-        try:
+    # （暫時性錯誤已由 notion_api.call_notion 退避重試）
+    try:
+        with metrics.span("update_status"):
             update_page_status(page_id, "Processed")
-            break
-        except Exception as e:
-            print(f"⚠️ [Notion] 狀態更新失敗 (第 {attempt} 次): {e}")
-            if attempt == STATUS_UPDATE_MAX_RETRIES:
-                # Rollback: 將檔案從 notes/ 搬回 drafts/
-                print("🔄 [Rollback] 將檔案搬回 drafts/，下次重新處理")
-                _rollback_file(dest_path, file_path, metadata, body)
-                return
+    except Exception as e:
+        print(f"⚠️ [Notion] 狀態更新失敗: {e}")
+        # Rollback: 將檔案從 notes/ 搬回 drafts/
+        print("🔄 [Rollback] 將檔案搬回 drafts/，下次重新處理")
+        _rollback_file(dest_path, file_path, metadata, body)
+        return
 
     print(f"✅ [Done] {title}")
 
@@ -193,6 +367,8 @@ def _rollback_file(dest_path, original_path, metadata, body):
         # 刪除 notes/ 中的檔案
         if os.path.exists(dest_path):
             os.remove(dest_path)
+        remove_note(dest_path)
+        dedup_index.remove_note(dest_path)
         print(f"🔄 [Rollback] 已還原: {original_path}")
     except Exception as e:
         print(f"🚨 [Rollback] 還原失敗: {e}")
@@ -202,22 +378,174 @@ def _rollback_file(dest_path, original_path, metadata, body):
 # Main
 # ---------------------------------------------------------------------------
 
-def main():
+def _timed_process(file_path, parsed=None):
+    """執行 process_single_draft 並回傳耗時（秒）。"""
+    started = time.perf_counter()
+    with metrics.span("draft", draft=file_path):
+        process_single_draft(file_path, parsed)
+    return time.perf_counter() - started
+
+
+_PLAN_ACTIONS = {
+    "create": "建立新頁面",
+    "resume": "從 checkpoint 第 {offset} 個 block 續傳",
+    "update": "diff 同步既有頁面（讀取與寫入數視變動而定，以下為下限）",
+}
+
+
+def dry_run(drafts):
+    """不呼叫任何 API，列出每個 draft 的 blocks、payload 與預估請求數。
+
+    drafts 為 validate_drafts 回傳的 {file_path: (metadata, body)}。
+    """
+    total_requests = 0
+    total_issues = 0
+    lower_bound = False
+    for metadata, body in drafts.values():
+        title = metadata["title"]
+        entry = get_entry(title)
+        action = _publish_action(entry, content_hash(metadata, body))
+        offset = entry["checkpoint"] if action == "resume" else 0
+        # 與 process_single_draft 相同：內容未變更時不轉換，只更新狀態
+        plan = plan_page(() if action == "skip" else _build_content_blocks(body), action=action, offset=offset)
+        total_requests += plan["total_requests"]
+        total_issues += len(plan["issues"])
+        lower_bound |= plan["lower_bound"]
+        if action == "skip":
+            print(f"⏭️ [Plan] {title}: 內容未變更，僅更新狀態（{plan['total_requests']} 次請求）")
+            continue
+        print(f"📐 [Plan] {title} — {_PLAN_ACTIONS[action].format(offset=offset)}")
+        print(format_plan(plan))
+
+    rate = get_rate_limiter().rate
+    print(f"\n📊 [Plan] {len(drafts)} 個 draft，共{'至少' if lower_bound else '約'} {total_requests} 次請求，"
+          f"以 {rate:g} req/s 預估 {total_requests / rate:.1f}s；違反限制 {total_issues} 處")
+
+
+def main(concurrency=PUBLISH_CONCURRENCY, plan_only=False, metrics_path=None,
+         skip_duplicates=False, dedup_threshold=DEDUP_THRESHOLD, check_dedup=True):
+    """發布 drafts/ 中所有 draft，回傳 {file_path: 耗時秒數}（dry-run 或沒有 draft 時為空）
+
+    metrics_path（或 PUBLISH_METRICS_FILE）指定時，各階段 span 與 API 呼叫會寫成 JSON lines。
+    skip_duplicates 為 True 時，與既有筆記近似重複的 drafts 保留在 drafts/ 不發布；
+    check_dedup 為 False 時完全略過近似重複檢查。
+    """
     drafts = sorted(glob.glob(f"{DRAFTS_DIR}/*.md"))
     if not drafts:
         print("📭 [Draft Publisher] 沒有待處理的 draft 檔案")
-        return
+        return {}
+
+    # 同一 process 多次呼叫 main（例如 bench_publisher）時，各次的 summary 只統計本次
+    metrics.reset()
+    metrics.configure(metrics_path)
+    # 先並行解析所有 drafts：一次列出所有錯誤，只發布合格的 drafts
+    with metrics.span("validate"):
+        valid, invalid = validate_drafts(drafts)
+    if invalid:
+        _report_invalid(invalid)
+
+    duplicates = check_duplicates(valid, dedup_threshold) if valid and check_dedup else {}
+    if duplicates and skip_duplicates:
+        valid = {path: parsed for path, parsed in valid.items() if path not in duplicates}
+        print(f"⏭️ [Dedup] 略過 {len(duplicates)} 個近似重複的 draft（保留在 {DRAFTS_DIR}/）")
+
+    timings, failed = {}, {}
+    if plan_only:
+        dry_run(valid)
+    elif valid:
+        try:
+            _database_id()
+        except ConfigError as e:
+            print(f"❌ [Config] {e}")
+            metrics.close()
+            sys.exit(1)
+        try:
+            timings, failed = _publish(valid, concurrency)
+        finally:
+            # 發布過程只更新記憶體中的 dedup index，整批結束後寫入一次
+            dedup_index.save()
+        print("📈 [Metrics] 各階段耗時：")
+        print(metrics.format_summary())
+    metrics.close()
+
+    # 合格的 drafts 已發布；仍以非零結束讓 CI 標示有 draft 需要修正或發布失敗
+    if invalid or failed:
+        sys.exit(1)
+    return timings
 
-    print(f"📬 [Draft Publisher] 找到 {len(drafts)} 個 draft 檔案")
 
-    for i, file_path in enumerate(drafts):
-        process_single_draft(file_path)
+def _publish(drafts, concurrency):
+    """並行發布已驗證的 drafts（{file_path: (metadata, body)}）。
 
-        # 節流（最後一個不需要 delay）
-        if i < len(drafts) - 1:
-            time.sleep(PAGE_DELAY_SECONDS)
+    回傳 (timings, failed)：各 draft 耗時與 {file_path: 錯誤訊息}；
+    單一 draft 的例外不會中斷其他 drafts，由 main 決定 exit code。
+    """
+    concurrency = max(1, min(concurrency, len(drafts)))
+    print(f"📬 [Draft Publisher] 找到 {len(drafts)} 個 draft 檔案（並行數 {concurrency}）")
+
+    # 節流交給共用的 rate limiter（clients.get_rate_limiter），不再固定 sleep
+    run_started = time.perf_counter()
+    timings, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(_timed_process, path, parsed): path
+                   for path, parsed in drafts.items()}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                elapsed = future.result()
+            except Exception as e:
+                failed[file_path] = str(e)
+                print(f"❌ [Draft] {file_path} 發布失敗: {e}")
+                continue
+            timings[file_path] = elapsed
+            print(f"⏱️ [Timing] {file_path}: {elapsed:.2f}s")
+
+    total = time.perf_counter() - run_started
+    print(f"🏁 [Draft Publisher] 完成 {len(timings)} 個 draft，失敗 {len(failed)} 個，總耗時 {total:.2f}s")
+    pool = get_pool_stats()
+    print(f"🔌 [Client] {pool['requests']} 次 HTTP 請求，新建 {pool['tcp_connects']} 條連線"
+          f"（TLS handshake {pool['tls_handshakes']} 次）")
+    return timings, failed
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="發布 drafts/ 中的 Markdown 草稿到 Notion")
+    parser.add_argument(
+        "--concurrency", type=int,
+        default=int(os.environ.get("PUBLISH_CONCURRENCY", PUBLISH_CONCURRENCY)),
+        help=f"同時處理的 draft 數量（預設 {PUBLISH_CONCURRENCY}，可用 PUBLISH_CONCURRENCY 環境變數覆寫）",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="只估算 blocks、payload 大小與 API 請求數，不呼叫 Notion、不搬移檔案",
+    )
+    parser.add_argument(
+        "--metrics", metavar="PATH", default=None,
+        help="將各階段耗時與 API 呼叫寫成 JSON lines（也可用 PUBLISH_METRICS_FILE 環境變數）",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="不讀取也不寫入 .cache/ 中的 Markdown 轉換快取",
+    )
+    parser.add_argument(
+        "--skip-duplicates", action="store_true",
+        help="與既有筆記近似重複的 drafts 不發布（預設只標示警告）",
+    )
+    parser.add_argument(
+        "--dedup-threshold", type=float, default=DEDUP_THRESHOLD,
+        help=f"視為近似重複的估計 Jaccard 相似度（預設 {DEDUP_THRESHOLD}）",
+    )
+    parser.add_argument(
+        "--no-dedup", action="store_true",
+        help="略過近似重複檢查",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
     _ensure_env()
-    main()
+    args = _parse_args()
+    conversion_cache.set_enabled(not args.no_cache)
+    main(concurrency=args.concurrency, plan_only=args.dry_run, metrics_path=args.metrics,
+         skip_duplicates=args.skip_duplicates, dedup_threshold=args.dedup_threshold,
+         check_dedup=not args.no_dedup)
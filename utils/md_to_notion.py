@@ -1,10 +1,35 @@
 """Pure markdown -> Notion block conversion. Zero API calls, zero side effects."""
 
 import re
+from functools import lru_cache
 import mistune
-from constants import NOTION_RICH_TEXT_LIMIT
+from constants import FALLBACK_CHUNK_SIZE, NOTION_RICH_TEXT_ARRAY_LIMIT, NOTION_RICH_TEXT_LIMIT
 from notion_languages import normalize_notion_language
 
+DEFAULT_PLUGINS = ('table', 'strikethrough')
+
+# 轉換輸出有任何變動時遞增，讓 conversion_cache 中的舊結果失效
+CONVERTER_VERSION = 1
+
+_ANCHOR_TAG_RE = re.compile(r'<a\s+id="[^"]*">\s*</a>')
+_MERMAID_BRACKET_LABEL_RE = re.compile(r'\[([^"\[\]]*\([^"\[\]]*)\]')
+_MERMAID_EDGE_LABEL_RE = re.compile(r'\|([^"|]*\([^"|]*)\|')
+_MERMAID_FENCE_RE = re.compile(r'(```mermaid\s*\n)(.*?)(```)', re.DOTALL)
+
+
+@lru_cache(maxsize=None)
+def _get_parser(plugins=DEFAULT_PLUGINS):
+    """回傳快取的 mistune AST parser（依 plugin 組合 keyed）。
+
+    mistune 的 Markdown 物件在每次呼叫時才建立 parse state，可安全重複使用。
+    """
+    return mistune.create_markdown(renderer='ast', plugins=list(plugins))
+
+
+def parse_markdown(markdown_text):
+    """以快取的 parser 將 Markdown 解析成頂層 AST tokens（list of dict）"""
+    return _get_parser()(markdown_text)
+
 
 # ---------------------------------------------------------------------------
 # Inline helpers
@@ -29,44 +54,133 @@ def _get_inline_children(item_children):
     return []
 
 
-def inline_to_rich_text(children):
-    """將 mistune inline AST tokens 轉成 Notion rich_text 陣列"""
-    rich_text = []
-    if not children:
-        return [{"text": {"content": ""}}]
+# inline token type → Notion annotation（可巢狀疊加）
+_INLINE_ANNOTATIONS = {
+    'strong': 'bold',
+    'emphasis': 'italic',
+    'strikethrough': 'strikethrough',
+}
+
+
+def _append_segment(rich_text, content, annotations, url):
+    """加入一個 rich_text 片段；與前一片段格式完全相同時直接合併內容"""
+    if not content:
+        return
+    if rich_text:
+        last = rich_text[-1]
+        if (last.get("annotations", {}) == annotations
+                and (last["text"].get("link") or {}).get("url") == url):
+            last["text"]["content"] += content
+            return
+    segment = {"text": {"content": content}}
+    if url:
+        segment["text"]["link"] = {"url": url}
+    if annotations:
+        segment["annotations"] = dict(annotations)
+    rich_text.append(segment)
+
+
+def _walk_inline(children, annotations, url, rich_text):
+    """單次走訪 inline AST，沿路疊加 annotations / link，輸出到 rich_text"""
     for token in children:
         ttype = token.get('type', '')
-        if ttype == 'text':
-            rich_text.append({"text": {"content": token['raw']}})
-        elif ttype == 'strong':
-            inner = _extract_plain_text(token.get('children', []))
-            rich_text.append({"text": {"content": inner}, "annotations": {"bold": True}})
-        elif ttype == 'emphasis':
-            inner = _extract_plain_text(token.get('children', []))
-            rich_text.append({"text": {"content": inner}, "annotations": {"italic": True}})
+        if ttype in _INLINE_ANNOTATIONS:
+            nested = {**annotations, _INLINE_ANNOTATIONS[ttype]: True}
+            _walk_inline(token.get('children', []), nested, url, rich_text)
         elif ttype == 'codespan':
-            rich_text.append({"text": {"content": token.get('raw', '')}, "annotations": {"code": True}})
-        elif ttype == 'strikethrough':
-            inner = _extract_plain_text(token.get('children', []))
-            rich_text.append({"text": {"content": inner}, "annotations": {"strikethrough": True}})
+            _append_segment(rich_text, token.get('raw', ''), {**annotations, 'code': True}, url)
         elif ttype == 'link':
-            link_text = _extract_plain_text(token.get('children', []))
-            url = token.get('attrs', {}).get('url', '')
-            if url.startswith('#'):
-                # Anchor link — 在 Notion 裡顯示為純文字
-                rich_text.append({"text": {"content": link_text}})
-            else:
-                rich_text.append({"text": {"content": link_text, "link": {"url": url}}})
+            href = token.get('attrs', {}).get('url', '')
+            # Anchor link — 在 Notion 裡顯示為純文字
+            link_url = None if href.startswith('#') else href
+            _walk_inline(token.get('children', []), annotations, link_url, rich_text)
         elif ttype in ('softbreak', 'linebreak'):
-            rich_text.append({"text": {"content": "\n"}})
-        else:
-            if 'children' in token:
-                rich_text.extend(inline_to_rich_text(token['children']))
-            elif 'raw' in token:
-                rich_text.append({"text": {"content": token['raw']}})
+            _append_segment(rich_text, "\n", annotations, url)
+        elif 'children' in token:
+            _walk_inline(token['children'], annotations, url, rich_text)
+        elif 'raw' in token:
+            _append_segment(rich_text, token['raw'], annotations, url)
+
+
+def inline_to_rich_text(children):
+    """將 mistune inline AST tokens 轉成 Notion rich_text 陣列
+
+    巢狀格式（例如粗斜體、粗體連結）會合併成同一片段的 annotations，
+    相鄰且格式相同的片段會合併以減少元素數量。
+    """
+    rich_text = []
+    _walk_inline(children or [], {}, None, rich_text)
     if not rich_text:
         rich_text.append({"text": {"content": ""}})
-    return rich_text
+    return _split_rich_text(rich_text)
+
+
+# ---------------------------------------------------------------------------
+# Rich text size limits
+# ---------------------------------------------------------------------------
+
+def utf16_len(text):
+    """Notion 以 UTF-16 code units 計算長度（emoji 等字元佔 2）"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _split_text(content):
+    """將超長文字切成多段，每段不超過 NOTION_RICH_TEXT_LIMIT。
+
+    優先在換行處切，其次在空白處切（分隔字元留在前一段結尾），
+    找不到安全邊界才硬切在 FALLBACK_CHUNK_SIZE。
+    """
+    chunks = []
+    while utf16_len(content) > NOTION_RICH_TEXT_LIMIT:
+        window = FALLBACK_CHUNK_SIZE
+        if utf16_len(content[:window]) > NOTION_RICH_TEXT_LIMIT:
+            # 幾乎全是 surrogate pair 字元時，code points 數量需減半
+            window = NOTION_RICH_TEXT_LIMIT // 2
+        cut = content.rfind('\n', 0, window)
+        if cut < window // 2:
+            cut = content.rfind(' ', 0, window)
+        cut = cut + 1 if cut >= window // 2 else window
+        chunks.append(content[:cut])
+        content = content[cut:]
+    chunks.append(content)
+    return chunks
+
+
+def _split_rich_text(rich_text):
+    """將超過 2000 字元的 rich_text 片段拆成多個片段，保留 annotations 與 link"""
+    result = []
+    for segment in rich_text:
+        content = segment["text"]["content"]
+        if len(content) <= NOTION_RICH_TEXT_LIMIT // 2 or utf16_len(content) <= NOTION_RICH_TEXT_LIMIT:
+            result.append(segment)
+            continue
+        for chunk in _split_text(content):
+            result.append({**segment, "text": {**segment["text"], "content": chunk}})
+    return result
+
+
+def _chunk_rich_text(rich_text):
+    """依每個 block 最多 100 個 rich_text 元素切組"""
+    return [
+        rich_text[start:start + NOTION_RICH_TEXT_ARRAY_LIMIT]
+        for start in range(0, len(rich_text), NOTION_RICH_TEXT_ARRAY_LIMIT)
+    ] or [rich_text]
+
+
+def _fit_rich_text(rich_text, limit=NOTION_RICH_TEXT_ARRAY_LIMIT):
+    """將 rich_text 壓到 limit 個元素以內，用於無法拆成多個 block 的表格儲存格。
+
+    前面的片段保留格式，超出的部分合併成純文字（仍依 NOTION_RICH_TEXT_LIMIT 切段）；
+    整格文字多到純文字也放不下時，截斷到 limit 段。
+    """
+    if len(rich_text) <= limit:
+        return rich_text
+    print(f"⚠️ [Convert] 表格儲存格有 {len(rich_text)} 個格式片段（上限 {limit}），超出部分改為純文字")
+    for keep in range(limit - 1, -1, -1):
+        tail = _split_text("".join(segment["text"]["content"] for segment in rich_text[keep:]))
+        if keep + len(tail) <= limit:
+            return rich_text[:keep] + [{"text": {"content": chunk}} for chunk in tail]
+    return [{"text": {"content": chunk}} for chunk in tail[:limit]]
 
 
 # ---------------------------------------------------------------------------
@@ -76,27 +190,17 @@ def inline_to_rich_text(children):
 def _sanitize_mermaid(code):
     """Quote Mermaid node/edge labels that contain parentheses to prevent parse errors."""
     # Quote [...] labels containing ( or ) that aren't already quoted
-    code = re.sub(
-        r'\[([^"\[\]]*\([^"\[\]]*)\]',
-        lambda m: f'["{m.group(1)}"]',
-        code
-    )
+    code = _MERMAID_BRACKET_LABEL_RE.sub(lambda m: f'["{m.group(1)}"]', code)
     # Quote |...| edge labels containing ( or ) that aren't already quoted
-    code = re.sub(
-        r'\|([^"|]*\([^"|]*)\|',
-        lambda m: f'|"{m.group(1)}"|',
-        code
-    )
+    code = _MERMAID_EDGE_LABEL_RE.sub(lambda m: f'|"{m.group(1)}"|', code)
     return code
 
 
 def _sanitize_mermaid_in_markdown(content):
     """對 Markdown 原文中所有 ```mermaid 區塊套用 _sanitize_mermaid，確保 GitHub 也能正確渲染。"""
-    return re.sub(
-        r'(```mermaid\s*\n)(.*?)(```)',
+    return _MERMAID_FENCE_RE.sub(
         lambda m: m.group(1) + _sanitize_mermaid(m.group(2)) + m.group(3),
         content,
-        flags=re.DOTALL,
     )
 
 
@@ -104,7 +208,7 @@ def _sanitize_mermaid_in_markdown(content):
 # Block-level helpers
 # ---------------------------------------------------------------------------
 
-def _is_toc_list(list_token):
+def is_toc_list(list_token):
     """檢查一個 list 是否為 TOC（所有 items 都是 anchor links）"""
     for item in list_token.get('children', []):
         inline = _get_inline_children(item.get('children', []))
@@ -119,13 +223,38 @@ def _is_toc_list(list_token):
     return True
 
 
-def _make_block(block_type, inline_children):
-    """建立 Notion block（帶 rich_text）"""
-    return {
-        "object": "block",
-        "type": block_type,
-        block_type: {"rich_text": inline_to_rich_text(inline_children)}
-    }
+def _make_blocks(block_type, inline_children):
+    """建立 Notion block（帶 rich_text）。
+
+    rich_text 超過 100 個元素時拆成多個 blocks；heading 的後續部分改用 paragraph，
+    避免目錄出現重複標題。
+    """
+    blocks = []
+    for i, rich_text in enumerate(_chunk_rich_text(inline_to_rich_text(inline_children))):
+        btype = "paragraph" if i > 0 and block_type.startswith("heading") else block_type
+        blocks.append({
+            "object": "block",
+            "type": btype,
+            btype: {"rich_text": rich_text}
+        })
+    return blocks
+
+
+def _make_code_blocks(raw, info):
+    """建立 code block；超長程式碼拆成多個 rich_text 片段，超過 100 片段再拆成多個 blocks"""
+    lang = normalize_notion_language(info or 'plain text')
+    code = _sanitize_mermaid(raw) if lang == 'mermaid' else raw
+    rich_text = [{"text": {"content": chunk}} for chunk in _split_text(code)]
+    return [
+        {
+            "object": "block", "type": "code",
+            "code": {
+                "rich_text": chunk,
+                "language": lang
+            }
+        }
+        for chunk in _chunk_rich_text(rich_text)
+    ]
 
 
 def _convert_list(list_token):
@@ -146,23 +275,13 @@ def _convert_list(list_token):
             if child['type'] == 'list':
                 nested_blocks.extend(_convert_list(child))
             elif child['type'] == 'block_code':
-                code = child.get('raw', '')[:NOTION_RICH_TEXT_LIMIT]
-                lang = child.get('attrs', {}).get('info', '') or 'plain text'
-                lang = normalize_notion_language(lang)
-                if lang == 'mermaid':
-                    code = _sanitize_mermaid(code)
-                nested_blocks.append({
-                    "object": "block", "type": "code",
-                    "code": {
-                        "rich_text": [{"text": {"content": code}}],
-                        "language": lang
-                    }
-                })
+                nested_blocks.extend(_make_code_blocks(
+                    child.get('raw', ''), child.get('attrs', {}).get('info', '')))
 
-        block = _make_block(block_type, inline_children)
+        item_blocks = _make_blocks(block_type, inline_children)
         if nested_blocks:
-            block[block_type]["children"] = nested_blocks
-        blocks.append(block)
+            item_blocks[-1][block_type]["children"] = nested_blocks
+        blocks.extend(item_blocks)
 
     return blocks
 
@@ -176,7 +295,7 @@ def _convert_table(table_token):
         stype = section.get('type', '')
         if stype == 'table_head':
             head_cells = [
-                inline_to_rich_text(cell.get('children', []))
+                _fit_rich_text(inline_to_rich_text(cell.get('children', [])))
                 for cell in section.get('children', [])
                 if cell.get('type') == 'table_cell'
             ]
@@ -190,7 +309,7 @@ def _convert_table(table_token):
                 if table_row.get('type') != 'table_row':
                     continue
                 row_cells = [
-                    inline_to_rich_text(cell.get('children', []))
+                    _fit_rich_text(inline_to_rich_text(cell.get('children', [])))
                     for cell in table_row.get('children', [])
                     if cell.get('type') == 'table_cell'
                 ]
@@ -224,18 +343,28 @@ def _convert_table(table_token):
 
 def markdown_to_notion_blocks(markdown_text, for_notion=False):
     """使用 mistune AST parser 將 Markdown 轉成 Notion blocks"""
+    return list(iter_notion_blocks(markdown_text, for_notion=for_notion))
+
+
+def iter_notion_blocks(markdown_text, for_notion=False):
+    """markdown_to_notion_blocks 的 generator 版本：每處理一個頂層 token 就 yield 對應 blocks。
+
+    已轉換的 AST token 會立即釋放，搭配 append_blocks_batched 可邊轉換邊上傳，
+    不需要同時持有整份 block list。
+    """
     # 清理 HTML anchor tags
-    markdown_text = re.sub(r'<a\s+id="[^"]*">\s*</a>', '', markdown_text)
+    markdown_text = _ANCHOR_TAG_RE.sub('', markdown_text)
 
-    md = mistune.create_markdown(renderer='ast', plugins=['table', 'strikethrough'])
-    tokens = md(markdown_text)
+    tokens = parse_markdown(markdown_text)
+    # 反轉後從尾端 pop，讓處理過的 token 可被回收
+    tokens.reverse()
 
-    blocks = []
     skip_toc = False
 
     toc_keywords = ('目錄', 'table of contents', 'toc', '內容大綱', 'outline')
 
-    for token in tokens:
+    while tokens:
+        token = tokens.pop()
         ttype = token.get('type', '')
 
         if ttype == 'blank_line':
@@ -253,50 +382,46 @@ def markdown_to_notion_blocks(markdown_text, for_notion=False):
             skip_toc = False
 
             block_type = f"heading_{min(level, 3)}"
-            blocks.append(_make_block(block_type, token.get('children', [])))
+            yield from _make_blocks(block_type, token.get('children', []))
 
         # Paragraph
         elif ttype == 'paragraph':
-            blocks.append(_make_block("paragraph", token.get('children', [])))
+            yield from _make_blocks("paragraph", token.get('children', []))
 
         # List
         elif ttype == 'list':
             # For Notion: 跳過 TOC list（所有 items 都是 anchor links）
-            if for_notion and (skip_toc or _is_toc_list(token)):
+            if for_notion and (skip_toc or is_toc_list(token)):
                 skip_toc = False
                 continue
-            list_blocks = _convert_list(token)
-            blocks.extend(list_blocks)
+            yield from _convert_list(token)
 
         # Code block
         elif ttype == 'block_code':
-            code = token.get('raw', '')[:NOTION_RICH_TEXT_LIMIT]
-            lang = token.get('attrs', {}).get('info', '') or 'plain text'
-            lang = normalize_notion_language(lang)
-            if lang == 'mermaid':
-                code = _sanitize_mermaid(code)
-            blocks.append({
-                "object": "block", "type": "code",
-                "code": {
-                    "rich_text": [{"text": {"content": code}}],
-                    "language": lang
-                }
-            })
+            yield from _make_code_blocks(token.get('raw', ''), token.get('attrs', {}).get('info', ''))
 
         # Table
         elif ttype == 'table':
             table_block = _convert_table(token)
             if table_block:
-                blocks.append(table_block)
+                yield table_block
 
         # Divider
         elif ttype == 'thematic_break':
-            blocks.append({"object": "block", "type": "divider", "divider": {}})
+            yield {"object": "block", "type": "divider", "divider": {}}
 
         # Block quote
         elif ttype == 'block_quote':
             for child in token.get('children', []):
                 if child['type'] == 'paragraph':
-                    blocks.append(_make_block("quote", child.get('children', [])))
+                    yield from _make_blocks("quote", child.get('children', []))
 
-    return blocks
+
+def markdown_to_notion_blocks_many(markdown_texts, for_notion=False):
+    """批次轉換多份 Markdown，共用同一個快取的 parser，回傳 blocks list 的 list"""
+    return [markdown_to_notion_blocks(text, for_notion=for_notion) for text in markdown_texts]
+
+
+def markdown_plain_text(markdown_text):
+    """以 AST 取出 Markdown 的純文字（去除語法標記），每個頂層 block 一行"""
+    return '\n'.join(_extract_plain_text([token]) for token in parse_markdown(markdown_text))
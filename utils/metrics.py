@@ -0,0 +1,164 @@
+"""Lightweight pipeline instrumentation: timing spans and counters.
+
+記錄發布流程各階段的耗時（span）與計數器（API 呼叫、重試、送出 bytes、rate limit 等待），
+可在結束時輸出摘要表格，並可選擇把每筆事件寫成 JSON lines 檔案
+（configure(path) 或 PUBLISH_METRICS_FILE 環境變數）。
+
+span 會繼承同一執行緒中外層 span 的屬性（例如 draft 標題），
+JSONL 中的每筆 API 呼叫因此能對應回所屬的 draft 與階段。
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from constants import TW_TIMEZONE
+
+_lock = threading.Lock()
+_local = threading.local()
+_counters = Counter()
+# span 名稱 → 每次耗時（秒）
+_durations = defaultdict(list)
+_sink = None
+
+
+def configure(path=None):
+    """開啟 JSONL 輸出；path 為 None 時讀取 PUBLISH_METRICS_FILE，兩者皆無則只保留記憶體內統計。"""
+    global _sink
+    path = path or os.environ.get("PUBLISH_METRICS_FILE")
+    with _lock:
+        if _sink is not None:
+            _sink.close()
+            _sink = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _sink = open(path, "a", encoding="utf-8")
+
+
+def close():
+    """寫入一筆 summary 記錄後關閉 JSONL 輸出。"""
+    global _sink
+    data = summary()
+    with _lock:
+        if _sink is not None:
+            _emit({"type": "summary", **data})
+            _sink.close()
+            _sink = None
+
+
+def reset():
+    """清除累計的 span 與計數器（不影響 JSONL 輸出設定）。"""
+    with _lock:
+        _counters.clear()
+        _durations.clear()
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _emit(record):
+    # 呼叫端需持有 _lock
+    if _sink is not None:
+        record["ts"] = datetime.now(TW_TIMEZONE).isoformat(timespec="milliseconds")
+        _sink.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        _sink.flush()
+
+
+def record_span(name, seconds, **attrs):
+    """記錄一段已量測好的耗時（例如 generator 中累計的轉換時間）。"""
+    stack = _stack()
+    inherited = {}
+    for _, parent_attrs in stack:
+        inherited.update(parent_attrs)
+    inherited.update(attrs)
+    with _lock:
+        _durations[name].append(seconds)
+        _emit({
+            "type": "span",
+            "name": name,
+            "parent": stack[-1][0] if stack else None,
+            "duration_ms": round(seconds * 1000, 3),
+            **inherited,
+        })
+
+
+@contextmanager
+def span(name, **attrs):
+    """量測 with 區塊的耗時；發生例外時記錄 error 後重新拋出。"""
+    stack = _stack()
+    stack.append((name, attrs))
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        stack.pop()
+        extra = {"error": error} if error else {}
+        record_span(name, time.perf_counter() - started, **attrs, **extra)
+
+
+def incr(name, value=1):
+    """累加計數器。"""
+    with _lock:
+        _counters[name] += value
+
+
+def timed_iter(iterable, name, **attrs):
+    """包裝 iterable，累計 next() 花費的時間，耗盡時記錄成一個 span。
+
+    用於 iter_notion_blocks 這類與上傳交錯執行的 generator，單獨量出轉換本身的耗時。
+    """
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        record_span(name, elapsed, **attrs)
+
+
+def summary():
+    """回傳 {"spans": {name: {count, total_s, mean_ms, p50_ms, max_ms}}, "counters": {...}}。"""
+    with _lock:
+        spans = {}
+        for name, values in _durations.items():
+            ordered = sorted(values)
+            spans[name] = {
+                "count": len(ordered),
+                "total_s": round(sum(ordered), 3),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+            }
+        return {"spans": spans, "counters": dict(_counters)}
+
+
+def format_summary():
+    """將 summary() 排版成表格文字（span 依總耗時排序）。"""
+    data = summary()
+    lines = [f"  {'階段':<36} {'次數':>6} {'總耗時':>9} {'平均':>9} {'p50':>9} {'最大':>9}"]
+    for name, s in sorted(data["spans"].items(), key=lambda item: -item[1]["total_s"]):
+        lines.append(f"  {name:<36} {s['count']:>6} {s['total_s']:>8.2f}s {s['mean_ms']:>7.1f}ms "
+                     f"{s['p50_ms']:>7.1f}ms {s['max_ms']:>7.1f}ms")
+    if data["counters"]:
+        lines.append("  計數器: " + "、".join(
+            f"{name} {value:,.2f}" if isinstance(value, float) else f"{name} {value:,}"
+            for name, value in sorted(data["counters"].items())))
+    return "\n".join(lines)
@@ -0,0 +1,112 @@
+"""Precomputed VitePress navigation manifest (notes/.vitepress/sidebar.json).
+
+記錄每個分類下的筆記（依檔名排序的標題、連結、Updated 時間），
+draft_publisher 搬移筆記時增量插入，VitePress config 只需讀取這一個檔案，
+不必在每次載入設定時掃描整個 notes/ 目錄。
+"""
+
+import bisect
+import glob
+import json
+import os
+import threading
+
+from constants import NAV_MANIFEST_PATH, NOTES_DIR
+from notes_layout import UPDATED_NOTE_RE
+
+NAV_MANIFEST_VERSION = 1
+
+# 只在檔案開頭搜尋 Updated 註記
+_HEAD_BYTES = 4096
+
+# Module-level cache (populated on first access); guarded for worker threads
+_nav = None
+_lock = threading.Lock()
+
+
+def _load():
+    global _nav
+    if _nav is None:
+        if os.path.exists(NAV_MANIFEST_PATH):
+            with open(NAV_MANIFEST_PATH, "r", encoding="utf-8") as f:
+                _nav = json.load(f)
+        else:
+            # 尚未產生過 manifest：先掃描既有筆記，避免第一次增量插入後只剩新筆記
+            _nav = {"version": NAV_MANIFEST_VERSION, "categories": _scan(NOTES_DIR)}
+    return _nav
+
+
+def _save():
+    """原子寫入（先寫暫存檔再 rename），避免中斷時留下半份 JSON。"""
+    os.makedirs(os.path.dirname(NAV_MANIFEST_PATH) or ".", exist_ok=True)
+    tmp_path = f"{NAV_MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_nav, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, NAV_MANIFEST_PATH)
+
+
+def _entry(note_file, updated):
+    """notes/{category}/{name}.md → (category, {"text", "link", "updated"})"""
+    category = os.path.basename(os.path.dirname(note_file))
+    name = os.path.splitext(os.path.basename(note_file))[0]
+    return category, {"text": name, "link": f"/{category}/{name}", "updated": updated}
+
+
+def _file_name(item):
+    return f"{item['text']}.md"
+
+
+def _insert(items, item):
+    # items 依檔名排序（與 config.mjs 掃描目錄時的排序一致），同名則取代
+    index = bisect.bisect_left(items, _file_name(item), key=_file_name)
+    if index < len(items) and items[index]["text"] == item["text"]:
+        items[index] = item
+    else:
+        items.insert(index, item)
+
+
+def record_note(note_file, updated):
+    """將 notes/{category}/{name}.md 插入（或更新）到 manifest，並立即落盤。"""
+    category, item = _entry(note_file, updated)
+    with _lock:
+        _insert(_load()["categories"].setdefault(category, []), item)
+        _save()
+
+
+def remove_note(note_file):
+    """從 manifest 移除筆記（例如發布失敗 rollback 時），並立即落盤。"""
+    category, item = _entry(note_file, None)
+    with _lock:
+        categories = _load()["categories"]
+        items = [existing for existing in categories.get(category, []) if existing["text"] != item["text"]]
+        if items:
+            categories[category] = items
+        else:
+            categories.pop(category, None)
+        _save()
+
+
+def read_updated(note_file):
+    """讀取筆記開頭的 Updated 註記，沒有則回傳 None。"""
+    with open(note_file, "r", encoding="utf-8") as f:
+        match = UPDATED_NOTE_RE.search(f.read(_HEAD_BYTES))
+    return match.group(1).strip() if match else None
+
+
+def _scan(notes_dir):
+    categories = {}
+    for note_file in sorted(glob.glob(os.path.join(notes_dir, "*", "*.md"))):
+        category, item = _entry(note_file, read_updated(note_file))
+        categories.setdefault(category, []).append(item)
+    return categories
+
+
+def rebuild(notes_dir=NOTES_DIR):
+    """掃描 notes/ 重建整份 manifest（用於既有筆記或手動新增 / 刪除筆記後），回傳筆記數。"""
+    global _nav
+    categories = _scan(notes_dir)
+    with _lock:
+        _nav = {"version": NAV_MANIFEST_VERSION, "categories": categories}
+        _save()
+    return sum(len(items) for items in categories.values())
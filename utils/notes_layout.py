@@ -0,0 +1,34 @@
+"""Layout of published notes under notes/: file paths and the Updated annotation.
+
+draft_publisher（發布）與 notion_exporter（反向匯出）共用，
+兩者寫出的筆記路徑與格式因此一致。
+"""
+
+import re
+
+from constants import NOTES_DIR
+
+# 筆記 H1 之後的 "> Updated: 2026-01-01 12:00" 註記（由 insert_updated_note 插入）
+UPDATED_NOTE_RE = re.compile(r"^> Updated: (.+)$", re.MULTILINE)
+
+# frontmatter 的 category 不在 CATEGORIES、或 Notion 頁面沒有 Category 時使用
+FALLBACK_CATEGORY = "99-Inbox"
+
+
+def note_path(category, title):
+    """筆記在 notes/ 下的路徑：notes/{category}/{safe_title}.md"""
+    safe_title = title.replace("/", "-").replace("\\", "-")
+    return f"{NOTES_DIR}/{category}/{safe_title}.md"
+
+
+def insert_updated_note(body, updated):
+    """在 H1 標題後插入 "> Updated: {updated}" 註記"""
+    content_lines = body.split("\n")
+    if content_lines and content_lines[0].startswith("# "):
+        content_lines.insert(1, f"\n> Updated: {updated}\n")
+    return "\n".join(content_lines)
+
+
+def strip_updated_note(text):
+    """移除 insert_updated_note 插入的 Updated 註記行"""
+    return UPDATED_NOTE_RE.sub("", text)
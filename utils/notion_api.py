@@ -0,0 +1,166 @@
+"""Resilient Notion API calls: shared rate limiting plus retry with backoff.
+
+所有 reader / writer 透過 call_notion（或 call_notion_async）呼叫 Notion client，
+依錯誤類型決定是否重試：
+  - rate_limited: 429，依 Retry-After header 等待
+  - server_error: 5xx / 409 conflict，指數退避 + jitter
+  - network: timeout、連線錯誤，指數退避 + jitter
+  - validation: 其餘 4xx（參數錯誤、權限、找不到），不重試
+
+非冪等的寫入（pages.create、blocks.children.append）以 idempotent=False 呼叫：
+只重試 429 與連線建立前的錯誤（請求確定沒送到 Notion）；timeout、5xx、409 時
+請求可能已生效，直接拋出，由呼叫端讀回頁面狀態後再決定是否重送（見 notion_writer）。
+429 的 Retry-After 會暫停共用的 rate limiter，讓其他 worker 一起退避。
+"""
+
+import asyncio
+import random
+import re
+import time
+
+import httpx
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+import metrics
+from clients import get_async_semaphore, get_rate_limiter
+from constants import NOTION_MAX_RETRIES, RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS
+
+RATE_LIMITED = "rate_limited"
+SERVER_ERROR = "server_error"
+NETWORK = "network"
+VALIDATION = "validation"
+
+RETRYABLE_CATEGORIES = {RATE_LIMITED, SERVER_ERROR, NETWORK}
+_RETRYABLE_STATUSES = {409, 500, 502, 503, 504}
+# 連線建立前（含等待連線池）失敗：請求一定沒有送出
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def classify_error(exc):
+    """將例外歸類為 rate_limited / server_error / network / validation。"""
+    if isinstance(exc, (RequestTimeoutError, httpx.TransportError)):
+        return NETWORK
+    if isinstance(exc, HTTPResponseError):  # 包含 APIResponseError
+        if exc.status == 429:
+            return RATE_LIMITED
+        if exc.status in _RETRYABLE_STATUSES:
+            return SERVER_ERROR
+    return VALIDATION
+
+
+def is_connect_error(exc):
+    """請求是否在連線建立前就失敗（notion_client 會把 ConnectTimeout 包成 RequestTimeoutError）。"""
+    if isinstance(exc, RequestTimeoutError):
+        exc = exc.__context__
+    return isinstance(exc, _CONNECT_ERRORS)
+
+
+def should_retry(exc, idempotent=True):
+    """依錯誤類型判斷能否直接重送；非冪等寫入只重試 429 與連線建立前的錯誤。"""
+    category = classify_error(exc)
+    if category not in RETRYABLE_CATEGORIES:
+        return False
+    return idempotent or category == RATE_LIMITED or is_connect_error(exc)
+
+
+def is_ambiguous_write(exc):
+    """非冪等寫入失敗但請求可能已生效（timeout、5xx、409），需讀回狀態確認。"""
+    return should_retry(exc) and not should_retry(exc, idempotent=False)
+
+
+def retry_delay(exc, attempt):
+    """第 attempt 次失敗後的等待秒數：優先使用 Retry-After，否則指數退避 + full jitter。"""
+    if classify_error(exc) == RATE_LIMITED:
+        retry_after = getattr(exc, "headers", {}).get("Retry-After")
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY_SECONDS)
+        except (TypeError, ValueError):
+            pass
+    backoff = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(backoff / 2, backoff)
+
+
+def _describe(fn):
+    return getattr(fn, "__qualname__", getattr(fn, "__name__", repr(fn)))
+
+
+def _api_name(fn):
+    """"BlocksChildrenEndpoint.append" → "blocks.children.append"（metrics 用）"""
+    owner, _, method = _describe(fn).rpartition(".")
+    words = re.findall(r"[A-Z][a-z]*", owner.replace("Endpoint", ""))
+    return ".".join([w.lower() for w in words] + [method]) if words else method
+
+
+def _record_wait(waited):
+    if waited:
+        metrics.incr("rate_limit_waits")
+        metrics.incr("rate_limit_wait_s", waited)
+
+
+def _record_failure(category, will_retry):
+    metrics.incr(f"retries.{category}" if will_retry else "api_errors")
+    if will_retry:
+        metrics.incr("retries")
+
+
+def _log_retry(fn, exc, category, attempt, delay):
+    status = getattr(exc, "status", None)
+    detail = f"HTTP {status}" if status else type(exc).__name__
+    print(f"⏳ [Retry] {_describe(fn)} {category} ({detail})，"
+          f"{delay:.1f}s 後重試（第 {attempt}/{NOTION_MAX_RETRIES} 次）")
+
+
+def call_notion(fn, idempotent=True, **kwargs):
+    """經過共用 rate limiter 呼叫 Notion client 方法，可重試的錯誤自動退避重試。
+
+    idempotent=False 用於 pages.create、blocks.children.append 等重送會重複寫入的呼叫。
+    每次呼叫記錄一個 api.{endpoint} span（含重試與等待），並累計 metrics 計數器。
+    """
+    with metrics.span(f"api.{_api_name(fn)}"):
+        for attempt in range(1, NOTION_MAX_RETRIES + 1):
+            _record_wait(get_rate_limiter().acquire())
+            metrics.incr("api_calls")
+            try:
+                return fn(**kwargs)
+            except Exception as exc:
+                category = classify_error(exc)
+                will_retry = should_retry(exc, idempotent) and attempt < NOTION_MAX_RETRIES
+                _record_failure(category, will_retry)
+                if not will_retry:
+                    raise
+                delay = retry_delay(exc, attempt)
+                _log_retry(fn, exc, category, attempt, delay)
+                if category == RATE_LIMITED:
+                    # 暫停共用 rate limiter：所有 worker 的下一次 acquire 都會等待
+                    get_rate_limiter().pause(delay)
+                else:
+                    time.sleep(delay)
+
+
+async def call_notion_async(fn, idempotent=True, **kwargs):
+    """call_notion 的 asyncio 版本，另外受 in-flight semaphore 限制。
+
+    同一執行緒上的 task 會交錯執行，span 的巢狀關係不可靠，因此直接以 record_span 記錄耗時。
+    """
+    started = time.perf_counter()
+    try:
+        for attempt in range(1, NOTION_MAX_RETRIES + 1):
+            try:
+                async with get_async_semaphore():
+                    _record_wait(await get_rate_limiter().acquire_async())
+                    metrics.incr("api_calls")
+                    return await fn(**kwargs)
+            except Exception as exc:
+                category = classify_error(exc)
+                will_retry = should_retry(exc, idempotent) and attempt < NOTION_MAX_RETRIES
+                _record_failure(category, will_retry)
+                if not will_retry:
+                    raise
+                delay = retry_delay(exc, attempt)
+                _log_retry(fn, exc, category, attempt, delay)
+                if category == RATE_LIMITED:
+                    get_rate_limiter().pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+    finally:
+        metrics.record_span(f"api.{_api_name(fn)}", time.perf_counter() - started)
@@ -0,0 +1,105 @@
+"""Reverse sync: export Notion database pages back into notes/ as markdown.
+
+依 Status 查詢資料庫頁面，只向 Notion 查詢上次匯出後（last_edited_time watermark）有變更的頁面，
+並行抓取頁面 block 樹、轉成 Markdown 後寫入 notes/{category}/{title}.md。
+全部成功時才推進 watermark，失敗的頁面下次會重新匯出。
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from categories import CATEGORIES
+from constants import EXPORT_WORKERS, TW_TIMEZONE
+from nav_manifest import record_note
+from notes_layout import FALLBACK_CATEGORY, insert_updated_note, note_path
+from notion_reader import blocks_to_markdown, get_block_tree, query_changed_pages, query_pages
+from query_watermark import advance_watermark, load_watermark, watermark_key
+
+# 匯出只需要標題與分類（last_edited_time 為頁面頂層欄位，不受 filter_properties 影響）
+_EXPORT_PROPERTIES = ["Name", "Category"]
+
+
+def _parse_time(value):
+    # Notion 回傳 "2024-01-01T00:00:00.000Z"；Python 3.10 的 fromisoformat 不接受 "Z"
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _page_title(page):
+    title_parts = page.get("properties", {}).get("Name", {}).get("title", [])
+    return "".join(t.get("plain_text", "") for t in title_parts)
+
+
+def _page_category(page):
+    select = page.get("properties", {}).get("Category", {}).get("select") or {}
+    category = select.get("name") or FALLBACK_CATEGORY
+    # 分類會成為 notes/ 下的目錄名稱，只接受已知分類（與 draft_publisher 的 frontmatter 驗證一致）
+    if category not in CATEGORIES:
+        print(f"⚠️ [Export] {_page_title(page)} 的分類 '{category}' 不在已知分類中，使用 {FALLBACK_CATEGORY}")
+        category = FALLBACK_CATEGORY
+    return category
+
+
+def render_page(page, blocks):
+    """將頁面 block 樹轉成筆記格式：H1 標題 + Updated 註記 + 正文"""
+    body = blocks_to_markdown(blocks).strip("\n")
+    title = _page_title(page)
+    if not body.startswith("# "):
+        body = f"# {title}\n\n{body}"
+    return insert_updated_note(body, _page_updated(page)) + "\n"
+
+
+def _page_updated(page):
+    return _parse_time(page["last_edited_time"]).astimezone(TW_TIMEZONE).strftime("%Y-%m-%d %H:%M")
+
+
+def _export_page(page, skip_existing):
+    """抓取單一頁面並寫入 notes/，回傳 (狀態, 檔案路徑)"""
+    dest_path = note_path(_page_category(page), _page_title(page))
+    if skip_existing and os.path.exists(dest_path):
+        return "skipped", dest_path
+
+    md_content = render_page(page, get_block_tree(page["id"]))
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    with open(dest_path, "w", encoding="utf-8") as f:
+        f.write(md_content)
+    record_note(dest_path, _page_updated(page))
+    return "exported", dest_path
+
+
+def export_pages(statuses=None, max_workers=EXPORT_WORKERS, full=False, skip_existing=False):
+    """匯出資料庫頁面到 notes/，回傳統計 dict（exported / skipped / failed）。
+
+    statuses: 單一狀態、狀態 list 或 None（全部）
+    full: 忽略 watermark，重新匯出所有頁面
+    skip_existing: notes/ 已有同名檔案時不覆寫
+    """
+    key = watermark_key("export", statuses)
+    watermark = None if full else load_watermark(key)
+    # last_edited_time 只到分鐘，on_or_after 會重抓與 watermark 同一分鐘的頁面，但不會漏掉編輯
+    if full:
+        pages = query_pages(statuses, properties=_EXPORT_PROPERTIES)
+    else:
+        pages = query_changed_pages(key, statuses, properties=_EXPORT_PROPERTIES)
+    changed = [p for p in pages if _page_title(p)]
+    stats = {"exported": 0, "skipped": 0, "failed": 0}
+    print(f"📥 [Export] {len(changed)} 個頁面自 {watermark or '首次匯出'} 後有變更")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_export_page, page, skip_existing): page for page in changed}
+        for future in as_completed(futures):
+            page = futures[future]
+            try:
+                status, dest_path = future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"❌ [Export] {_page_title(page)} 匯出失敗: {e}")
+                continue
+            stats[status] += 1
+            if status == "exported":
+                print(f"💾 [Export] {_page_title(page)} → {dest_path}")
+
+    # 全部成功才推進 watermark，失敗的頁面下次重新匯出
+    if not stats["failed"]:
+        advance_watermark(key, changed)
+    return stats
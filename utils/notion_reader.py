@@ -1,18 +1,51 @@
 """Notion read-only operations."""
 
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from clients import get_notion_client
-from constants import NOTION_API_BATCH_SIZE
+from constants import NOTION_API_BATCH_SIZE, TREE_FETCH_REQUEST_BUDGET, TREE_FETCH_WORKERS
+from notion_api import call_notion
+from query_watermark import load_watermark
 
 
-def _paginate_blocks(block_id):
+class RequestBudgetExceeded(Exception):
+    """單一頁面的讀取請求數超過上限；partial 為超出前已取得的 blocks。"""
+
+    def __init__(self, message, partial=None):
+        super().__init__(message)
+        self.partial = partial or []
+
+
+class RequestBudget:
+    """Thread-safe 的請求計數器，限制單一頁面樹狀讀取的 API 呼叫數（None = 不限制）。"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def spend(self):
+        with self._lock:
+            if self.limit is not None and self.used >= self.limit:
+                raise RequestBudgetExceeded(f"request budget of {self.limit} exhausted")
+            self.used += 1
+
+
+def _paginate_blocks(block_id, budget=None):
     """分頁取得所有子 blocks"""
     notion = get_notion_client()
     results = []
     has_more = True
     start_cursor = None
     while has_more:
-        response = notion.blocks.children.list(
+        if budget is not None:
+            try:
+                budget.spend()
+            except RequestBudgetExceeded as e:
+                raise RequestBudgetExceeded(str(e), partial=results) from None
+        response = call_notion(
+            notion.blocks.children.list,
             block_id=block_id,
             start_cursor=start_cursor,
             page_size=NOTION_API_BATCH_SIZE
@@ -23,18 +56,119 @@ def _paginate_blocks(block_id):
     return results
 
 
+def get_block_tree(block_id, max_workers=TREE_FETCH_WORKERS,
+                   request_budget=TREE_FETCH_REQUEST_BUDGET):
+    """遞迴取得完整 block 樹，子 blocks 放在 block["children"]。
+
+    以「波次」廣度優先展開：同一層所有 has_children 的 blocks 並行抓取
+    （max_workers 個執行緒，仍受共用 rate limiter 節流）。
+    超過 request_budget 時停止展開，未展開的 block 標記 "children_truncated"；
+    連頂層都讀不完時回傳已取得的部分，並將最後一個 block 標記 "siblings_truncated"。
+    """
+    budget = RequestBudget(request_budget)
+    truncated = 0
+    try:
+        root = _paginate_blocks(block_id, budget)
+    except RequestBudgetExceeded as e:
+        root = e.partial
+        if root:
+            root[-1]["siblings_truncated"] = True
+        print(f"⚠️ [Notion] 超過讀取上限 {request_budget} 次，頂層只取得 {len(root)} 個 block: {block_id}")
+
+    def fetch(block):
+        try:
+            return _paginate_blocks(block["id"], budget)
+        except RequestBudgetExceeded:
+            return None
+
+    wave = [b for b in root if b.get("has_children")]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while wave:
+            next_wave = []
+            for block, children in zip(wave, executor.map(fetch, wave)):
+                if children is None:
+                    block["children_truncated"] = True
+                    truncated += 1
+                    continue
+                block["children"] = children
+                next_wave.extend(c for c in children if c.get("has_children"))
+            wave = next_wave
+
+    if truncated:
+        print(f"⚠️ [Notion] 超過讀取上限 {request_budget} 次，{truncated} 個 block 的子內容未展開: {block_id}")
+    return root
+
+
+def _query_kwargs(statuses, edited_since=None, sorts=None, property_ids=None):
+    """組出 databases.query 參數。
+
+    statuses: 單一狀態、狀態 list 或 None（不過濾 Status）
+    edited_since: ISO 時間字串，只取 last_edited_time on_or_after 該時間的頁面
+    sorts: Notion sorts 陣列
+    property_ids: 只回傳這些 property（filter_properties），減少回應大小
+    """
+    kwargs = {
+        "database_id": os.environ.get("NOTION_DATABASE_ID"),
+        # 加上 page_size=100 減少 HTTP 請求次數
+        "page_size": NOTION_API_BATCH_SIZE,
+    }
+    conditions = []
+    if isinstance(statuses, str):
+        statuses = [statuses]
+    if statuses:
+        status_conditions = [{"property": "Status", "status": {"equals": s}} for s in statuses]
+        conditions.append(status_conditions[0] if len(status_conditions) == 1
+                          else {"or": status_conditions})
+    if edited_since:
+        conditions.append({"timestamp": "last_edited_time",
+                           "last_edited_time": {"on_or_after": edited_since}})
+    if conditions:
+        kwargs["filter"] = conditions[0] if len(conditions) == 1 else {"and": conditions}
+    if sorts:
+        kwargs["sorts"] = sorts
+    if property_ids:
+        kwargs["filter_properties"] = property_ids
+    return kwargs
+
+
+# database_id → {property name: property id}
+_property_ids = {}
+
+
+def _resolve_property_ids(schema, properties):
+    """將 property 名稱轉成 id（filter_properties 只接受 id）；找不到的名稱視為 id 原樣傳遞"""
+    return [schema.get(name, name) for name in properties]
+
+
+def _get_property_schema():
+    database_id = os.environ.get("NOTION_DATABASE_ID")
+    if database_id not in _property_ids:
+        database = call_notion(get_notion_client().databases.retrieve, database_id=database_id)
+        _property_ids[database_id] = {
+            name: prop["id"] for name, prop in database.get("properties", {}).items()
+        }
+    return _property_ids[database_id]
+
+
 def get_draft_pages():
+    return query_pages("Draft")
+
+
+def query_pages(statuses=None, edited_since=None, sorts=None, properties=None):
+    """分頁查詢資料庫頁面；statuses 可為單一狀態、狀態 list 或 None（全部）
+
+    edited_since / sorts / properties 見 _query_kwargs；properties 為 property 名稱 list。
+    """
     notion = get_notion_client()
-    database_id = os.environ.get("NOTION_DATABASE_ID")
+    property_ids = _resolve_property_ids(_get_property_schema(), properties) if properties else None
+    query_kwargs = _query_kwargs(statuses, edited_since, sorts, property_ids)
     results = []
     start_cursor = None
     while True:
-        response = notion.databases.query(
-            database_id=database_id,
-            # 加上 page_size=100 減少 HTTP 請求次數
-            page_size=NOTION_API_BATCH_SIZE,
-            filter={"property": "Status", "status": {"equals": "Draft"}},
-            start_cursor=start_cursor
+        response = call_notion(
+            notion.databases.query,
+            start_cursor=start_cursor,
+            **query_kwargs
         )
         batch = response.get("results", [])
         results.extend(batch)
@@ -47,58 +181,153 @@ def get_draft_pages():
     return results
 
 
+_OLDEST_EDIT_FIRST = [{"timestamp": "last_edited_time", "direction": "ascending"}]
+
+
+def query_changed_pages(key, statuses=None, properties=None):
+    """只查詢 watermark（key）之後有編輯的頁面，依 last_edited_time 由舊到新排序。
+
+    不會推進 watermark；呼叫端處理成功後以 query_watermark.advance_watermark(key, pages) 記錄。
+    """
+    return query_pages(statuses, edited_since=load_watermark(key),
+                       sorts=_OLDEST_EDIT_FIRST, properties=properties)
+
+
+def count_child_blocks(block_id):
+    """回傳 block（或頁面）目前的頂層子 block 數"""
+    return len(_paginate_blocks(block_id))
+
+
+def find_page_created_since(database_id, title, created_since):
+    """找出 created_since（ISO 時間）之後建立、標題為 title 的最新頁面，沒有則回傳 None。
+
+    用於 pages.create 結果不明（timeout、5xx）時確認頁面是否其實已建立。
+    """
+    response = call_notion(
+        get_notion_client().databases.query,
+        database_id=database_id,
+        filter={"and": [
+            {"property": "Name", "title": {"equals": title}},
+            {"timestamp": "created_time", "created_time": {"on_or_after": created_since}},
+        ]},
+        sorts=[{"timestamp": "created_time", "direction": "descending"}],
+        page_size=1,
+    )
+    results = response.get("results", [])
+    return results[0] if results else None
+
+
 def get_page_content(page_id):
-    blocks = _paginate_blocks(page_id)
-    text = ""
-    for block in blocks:
+    """取得頁面完整內容（含巢狀 blocks）並轉成 Markdown 文字"""
+    return blocks_to_markdown(get_block_tree(page_id))
+
+
+def blocks_to_markdown(blocks):
+    """將 get_block_tree 回傳的 block 樹轉成 Markdown（保留粗體、斜體、程式碼、連結等格式）"""
+    parts = []
+    _render_blocks(blocks, "", parts)
+    return "".join(parts)
+
+
+def _rich_text_to_markdown(rich_text):
+    """將 Notion rich_text 轉回 Markdown inline 語法"""
+    parts = []
+    for t in rich_text:
+        text = t.get("plain_text", "")
+        if not text:
+            continue
+        annotations = t.get("annotations") or {}
+        if annotations.get("code"):
+            text = f"`{text}`"
+        if annotations.get("bold"):
+            text = f"**{text}**"
+        if annotations.get("italic"):
+            text = f"*{text}*"
+        if annotations.get("strikethrough"):
+            text = f"~~{text}~~"
+        href = t.get("href") or ((t.get("text") or {}).get("link") or {}).get("url")
+        if href:
+            text = f"[{text}]({href})"
+        parts.append(text)
+    return "".join(parts)
+
+
+def _plain_text(rich_text):
+    return "".join(t.get("plain_text", "") for t in rich_text)
+
+
+def _render_blocks(blocks, indent, parts):
+    """將 block 樹渲染進 parts（list-based builder）；巢狀子 blocks 以兩格縮排表示"""
+    for i, block in enumerate(blocks):
         btype = block["type"]
+        data = block.get(btype, {})
 
         # 有 rich_text 的 block 類型（paragraph, headings, lists, quotes, callout, toggle）
         if btype in ("paragraph", "heading_1", "heading_2", "heading_3",
                       "bulleted_list_item", "numbered_list_item",
                       "quote", "callout", "toggle"):
-            rich_text = block[btype].get("rich_text", [])
-            line = "".join([t["plain_text"] for t in rich_text])
+            line = _rich_text_to_markdown(data.get("rich_text", []))
             if btype.startswith("heading"):
                 level = btype[-1]  # "1", "2", or "3"
-                text += "#" * int(level) + " " + line + "\n"
+                parts.append(f"{indent}{'#' * int(level)} {line}\n\n")
             elif btype == "bulleted_list_item":
-                text += "- " + line + "\n"
+                parts.append(f"{indent}- {line}\n")
             elif btype == "numbered_list_item":
-                text += "1. " + line + "\n"
+                parts.append(f"{indent}1. {line}\n")
             elif btype == "quote":
-                text += "> " + line + "\n"
+                parts.append(f"{indent}> {line}\n\n")
             else:
-                text += line + "\n"
+                parts.append(f"{indent}{line}\n\n")
 
         # Code block
         elif btype == "code":
-            rich_text = block["code"].get("rich_text", [])
-            code = "".join([t["plain_text"] for t in rich_text])
-            lang = block["code"].get("language", "")
-            text += f"```{lang}\n{code}\n```\n"
+            code = _plain_text(data.get("rich_text", []))
+            lang = data.get("language", "")
+            if lang == "plain text":
+                lang = ""
+            code = code.rstrip("\n").replace("\n", "\n" + indent)
+            parts.append(f"{indent}```{lang}\n{indent}{code}\n{indent}```\n\n")
 
         # 圖片
         elif btype == "image":
-            image_data = block["image"]
-            if image_data["type"] == "file":
-                img_url = image_data["file"]["url"]
-            elif image_data["type"] == "external":
-                img_url = image_data["external"]["url"]
+            if data["type"] == "file":
+                img_url = data["file"]["url"]
+            elif data["type"] == "external":
+                img_url = data["external"]["url"]
             else:
                 img_url = ""
-            caption = "".join([t["plain_text"] for t in image_data.get("caption", [])])
-            text += f"![{caption}]({img_url})\n"
+            caption = _plain_text(data.get("caption", []))
+            parts.append(f"{indent}![{caption}]({img_url})\n\n")
 
         # 分隔線
         elif btype == "divider":
-            text += "---\n"
+            parts.append(f"{indent}---\n\n")
 
         # To-do
         elif btype == "to_do":
-            rich_text = block["to_do"].get("rich_text", [])
-            line = "".join([t["plain_text"] for t in rich_text])
-            checked = "x" if block["to_do"].get("checked") else " "
-            text += f"- [{checked}] {line}\n"
+            line = _rich_text_to_markdown(data.get("rich_text", []))
+            checked = "x" if data.get("checked") else " "
+            parts.append(f"{indent}- [{checked}] {line}\n")
+
+        # 表格（rows 為 children）
+        elif btype == "table":
+            for row_index, row in enumerate(block.get("children", [])):
+                cells = [
+                    _rich_text_to_markdown(cell).replace("|", "\\|")
+                    for cell in row.get("table_row", {}).get("cells", [])
+                ]
+                parts.append(f"{indent}| {' | '.join(cells)} |\n")
+                if row_index == 0 and data.get("has_column_header"):
+                    parts.append(f"{indent}|{'---|' * len(cells)}\n")
+            parts.append("\n")
+            continue
+
+        # 巢狀子 blocks
+        if block.get("children"):
+            _render_blocks(block["children"], indent + "  ", parts)
+
+        # 清單結束後補空行，避免與下一段落黏在一起
+        if btype in ("bulleted_list_item", "numbered_list_item", "to_do") and not indent:
+            if i + 1 >= len(blocks) or blocks[i + 1]["type"] != btype:
+                parts.append("\n")
 
-    return text
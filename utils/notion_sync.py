@@ -0,0 +1,220 @@
+"""Block-level diff sync: patch an existing Notion page to match new blocks.
+
+以穩定的 block fingerprint 比對頁面現有 blocks 與新的轉換結果，
+只送出必要的 append / update / delete 呼叫。
+"""
+
+import difflib
+import hashlib
+import json
+
+from clients import get_notion_client
+from constants import NOTION_API_BATCH_SIZE
+from notion_api import call_notion
+from notion_reader import get_block_tree
+
+# 可用 blocks.update 原地更新內容的 block 類型
+UPDATABLE_TYPES = {
+    "paragraph", "heading_1", "heading_2", "heading_3",
+    "bulleted_list_item", "numbered_list_item", "quote", "to_do",
+    "code", "table_row",
+}
+
+# 參與比對的 block 屬性（其餘如 color、id、時間戳不影響內容）
+_CONTENT_FIELDS = ("language", "checked", "table_width", "has_column_header", "has_row_header")
+
+
+# ---------------------------------------------------------------------------
+# Fingerprints
+# ---------------------------------------------------------------------------
+
+def _canonical_rich_text(rich_text):
+    """將 request 格式或 API response 格式的 rich_text 正規化為可比較的 list。
+
+    空字串片段會被丟棄，相鄰且格式相同的片段會合併。
+    """
+    segments = []
+    for rt in rich_text or []:
+        text = rt.get("text") or {}
+        content = text.get("content", rt.get("plain_text", ""))
+        if not content:
+            continue
+        link = text.get("link") or {}
+        annotations = sorted(
+            key for key, value in (rt.get("annotations") or {}).items()
+            if value and not (key == "color" and value == "default")
+        )
+        style = (link.get("url"), annotations)
+        if segments and segments[-1][1] == style:
+            segments[-1] = (segments[-1][0] + content, style)
+        else:
+            segments.append((content, style))
+    return [[content, url, annotations] for content, (url, annotations) in segments]
+
+
+def _block_children(block):
+    """新 blocks 的 children 在 block[type]["children"]，既有 blocks 由 get_block_tree 放在 block["children"]。"""
+    if "children" in block:
+        return block["children"]
+    data = block.get(block.get("type"), {})
+    return data.get("children", []) if isinstance(data, dict) else []
+
+
+def _self_fingerprint(block):
+    """不含 children 的 block 內容 fingerprint。"""
+    btype = block.get("type")
+    data = block.get(btype, {}) if isinstance(block.get(btype), dict) else {}
+    canonical = {"type": btype}
+    if "rich_text" in data:
+        canonical["rich_text"] = _canonical_rich_text(data["rich_text"])
+    if "cells" in data:
+        canonical["cells"] = [_canonical_rich_text(cell) for cell in data["cells"]]
+    for field in _CONTENT_FIELDS:
+        if field in data:
+            canonical[field] = data[field]
+    raw = json.dumps(canonical, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def block_fingerprint(block):
+    """含 children（遞迴）的 block fingerprint，對 request 與 response 格式都穩定。"""
+    parts = [_self_fingerprint(block)]
+    parts.extend(block_fingerprint(child) for child in _block_children(block))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Diff & patch
+# ---------------------------------------------------------------------------
+
+class _Patcher:
+    """依序送出 patch 呼叫並統計次數。"""
+
+    def __init__(self):
+        self.notion = get_notion_client()
+        self.stats = {"appended": 0, "updated": 0, "deleted": 0, "unchanged": 0, "api_calls": 0}
+
+    def _call(self, fn, **kwargs):
+        self.stats["api_calls"] += 1
+        return call_notion(fn, **kwargs)
+
+    def append(self, parent_id, blocks, after=None):
+        """在 after 之後插入 blocks（每次最多 100 個），回傳最後一個新 block 的 id。"""
+        for start in range(0, len(blocks), NOTION_API_BATCH_SIZE):
+            batch = blocks[start:start + NOTION_API_BATCH_SIZE]
+            kwargs = {"block_id": parent_id, "children": batch}
+            if after:
+                kwargs["after"] = after
+            # 非冪等：結果不明時直接拋出，下次同步重新 diff 即可修正
+            response = self._call(self.notion.blocks.children.append, idempotent=False, **kwargs)
+            results = response.get("results", [])
+            after = results[-1]["id"] if results else after
+            self.stats["appended"] += len(batch)
+        return after
+
+    def update(self, old_block, new_block):
+        btype = new_block["type"]
+        data = {k: v for k, v in new_block[btype].items() if k != "children"}
+        self._call(self.notion.blocks.update, block_id=old_block["id"], **{btype: data})
+        self.stats["updated"] += 1
+
+    def delete(self, block):
+        self._call(self.notion.blocks.delete, block_id=block["id"])
+        self.stats["deleted"] += 1
+
+
+class _RewriteNeeded(Exception):
+    """無法定位插入點，需整段重建。"""
+
+
+def _can_patch_in_place(old_block, new_block):
+    """同類型、可 update，且 children 結構能遞迴同步時，才原地修改。"""
+    btype = new_block.get("type")
+    if old_block.get("type") != btype:
+        return False
+    old_children = _block_children(old_block)
+    new_children = _block_children(new_block)
+    if btype == "table":
+        data_old, data_new = old_block.get(btype, {}), new_block.get(btype, {})
+        return all(data_old.get(f) == data_new.get(f)
+                   for f in ("table_width", "has_column_header", "has_row_header"))
+    if btype not in UPDATABLE_TYPES:
+        return False
+    # children 只能透過遞迴同步；一邊有一邊沒有時整個重建
+    return bool(old_children) == bool(new_children)
+
+
+def _sync_children(patcher, parent_id, old_blocks, new_blocks):
+    """將 parent 底下的 old_blocks 同步成 new_blocks。"""
+    old_fps = [block_fingerprint(b) for b in old_blocks]
+    new_fps = [block_fingerprint(b) for b in new_blocks]
+    opcodes = difflib.SequenceMatcher(None, old_fps, new_fps, autojunk=False).get_opcodes()
+
+    # Notion 只能「插入在某個 block 之後」。若需要在最前面插入、而後面仍有保留的
+    # blocks，就無法定位，改為整段重建。
+    has_survivor = any(
+        tag == "equal" or any(
+            _can_patch_in_place(old, new)
+            for old, new in zip(old_blocks[i1:i2], new_blocks[j1:j2])
+        )
+        for tag, i1, i2, j1, j2 in opcodes
+    )
+    deleted = set()
+
+    def flush(pending, anchor):
+        if anchor is None and has_survivor:
+            raise _RewriteNeeded()
+        return patcher.append(parent_id, pending, after=anchor)
+
+    try:
+        _apply_opcodes(patcher, parent_id, old_blocks, new_blocks, opcodes, flush, deleted)
+    except _RewriteNeeded:
+        for block in old_blocks:
+            if block["id"] not in deleted:
+                patcher.delete(block)
+        patcher.append(parent_id, new_blocks)
+
+
+def _apply_opcodes(patcher, parent_id, old_blocks, new_blocks, opcodes, flush, deleted):
+    anchor = None
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            patcher.stats["unchanged"] += i2 - i1
+            anchor = old_blocks[i2 - 1]["id"]
+            continue
+
+        pending = []
+        olds, news = old_blocks[i1:i2], new_blocks[j1:j2]
+        for k in range(max(len(olds), len(news))):
+            old = olds[k] if k < len(olds) else None
+            new = news[k] if k < len(news) else None
+            if old and new and _can_patch_in_place(old, new):
+                if pending:
+                    anchor = flush(pending, anchor)
+                    pending = []
+                if _self_fingerprint(old) != _self_fingerprint(new) and new["type"] != "table":
+                    patcher.update(old, new)
+                old_children, new_children = _block_children(old), _block_children(new)
+                if old_children or new_children:
+                    _sync_children(patcher, old["id"], old_children, new_children)
+                anchor = old["id"]
+                continue
+            if old:
+                patcher.delete(old)
+                deleted.add(old["id"])
+            if new:
+                pending.append(new)
+        if pending:
+            anchor = flush(pending, anchor)
+
+
+def sync_page_blocks(page_id, new_blocks):
+    """讀取頁面現有 blocks，diff 後只送出必要的 append / update / delete。
+
+    回傳統計 dict（appended, updated, deleted, unchanged, api_calls）。
+    """
+    # 比對需要完整的樹，不套用讀取上限
+    old_blocks = get_block_tree(page_id, request_budget=None)
+    patcher = _Patcher()
+    _sync_children(patcher, page_id, old_blocks, list(new_blocks))
+    return patcher.stats
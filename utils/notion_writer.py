@@ -1,16 +1,30 @@
 """Notion write/update operations."""
 
-from datetime import datetime
-from clients import get_notion_client
-from constants import NOTION_API_BATCH_SIZE, TW_TIMEZONE
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from clients import get_async_notion_client, get_notion_client, run_async
+from constants import BULK_STATUS_WORKERS, NOTION_API_BATCH_SIZE, NOTION_MAX_RETRIES, TW_TIMEZONE
+from notion_api import call_notion, call_notion_async, is_ambiguous_write, retry_delay
+from notion_reader import count_child_blocks, find_page_created_since
+from notion_sync import sync_page_blocks
 
 
-def create_page_in_database(database_id, title, category, tags, children=None):
-    """在 Notion 資料庫中建立新頁面，回傳 page_id"""
-    notion = get_notion_client()
-    now = datetime.now(TW_TIMEZONE).strftime("%Y-%m-%dT%H:%M:%S+08:00")
+def _iter_batches(blocks, size=NOTION_API_BATCH_SIZE):
+    """將任意 iterable（list 或 generator）切成每批最多 size 個的 list"""
+    iterator = iter(blocks)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
 
-    properties = {
+def _build_page_properties(title, category, tags):
+    """組出資料庫頁面的 properties（Status 預設 Draft）"""
+    now = datetime.now(TW_TIMEZONE).strftime("%Y-%m-%dT%H:%M:%S+08:00")
+    return {
         "Name": {"title": [{"text": {"content": title}}]},
         "Status": {"status": {"name": "Draft"}},
         "Category": {"select": {"name": category}},
@@ -18,9 +32,41 @@ def create_page_in_database(database_id, title, category, tags, children=None):
         "Updated Time": {"date": {"start": now}},
     }
 
+
+def _write_verified(fn, verify, **kwargs):
+    """送出非冪等寫入；結果不明（timeout、5xx、409）時先以 verify() 讀回狀態再決定是否重送。
+
+    verify() 在寫入已生效時回傳對應結果（視同成功），未生效時回傳 None。
+    """
+    for attempt in range(1, NOTION_MAX_RETRIES + 1):
+        try:
+            return call_notion(fn, idempotent=False, **kwargs)
+        except Exception as exc:
+            if not is_ambiguous_write(exc) or attempt == NOTION_MAX_RETRIES:
+                raise
+            result = verify()
+            if result is not None:
+                print(f"🔍 [Verify] 寫入結果不明（{type(exc).__name__}），讀回確認已生效")
+                return result
+            delay = retry_delay(exc, attempt)
+            print(f"🔍 [Verify] 寫入結果不明（{type(exc).__name__}），讀回確認未生效，{delay:.1f}s 後重送")
+            time.sleep(delay)
+
+
+def create_page_in_database(database_id, title, category, tags, children=None, on_progress=None):
+    """在 Notion 資料庫中建立新頁面，回傳 page_id
+
+    children 可為 list 或 generator（例如 md_to_notion.iter_notion_blocks），
+    後者會邊轉換邊上傳。
+    on_progress(page_id, offset) 會在建立頁面與每個 batch 成功後呼叫，
+    offset 為已寫入 Notion 的頂層 block 數，可用來記錄續傳 checkpoint。
+    """
+    notion = get_notion_client()
+    properties = _build_page_properties(title, category, tags)
+
     # Notion API 限制：建立頁面時最多帶 100 個 children blocks
-    first_batch = children[:NOTION_API_BATCH_SIZE] if children else None
-    remaining = children[NOTION_API_BATCH_SIZE:] if children else []
+    remaining = iter(children or [])
+    first_batch = list(islice(remaining, NOTION_API_BATCH_SIZE))
 
     create_kwargs = {
         "parent": {"database_id": database_id},
@@ -29,29 +75,133 @@ def create_page_in_database(database_id, title, category, tags, children=None):
     if first_batch:
         create_kwargs["children"] = first_batch
 
-    response = notion.pages.create(**create_kwargs)
+    # Notion 的 created_time 只到分鐘，往前多留一分鐘容忍時鐘誤差
+    created_since = (datetime.now(timezone.utc) - timedelta(minutes=1)).strftime("%Y-%m-%dT%H:%M:00.000Z")
+    response = _write_verified(
+        notion.pages.create,
+        lambda: find_page_created_since(database_id, title, created_since),
+        **create_kwargs,
+    )
     page_id = response["id"]
     print(f"📝 [Notion] 新頁面已建立: {page_id}")
+    if on_progress:
+        on_progress(page_id, len(first_batch))
 
     # 超過 100 blocks 用 append_blocks_batched 補上
-    if remaining:
-        append_blocks_batched(page_id, remaining)
+    append_blocks_batched(page_id, remaining, start_offset=len(first_batch), on_progress=on_progress)
 
     return page_id
 
 
-def update_page_status(page_id, status):
-    """僅更新 Notion 頁面的 Status 屬性"""
+def update_page_in_database(page_id, title, category, tags, children=None):
+    """更新既有頁面的 properties（Status 重設為 Draft），並以 block diff 同步內容"""
     notion = get_notion_client()
-    notion.pages.update(
+    call_notion(
+        notion.pages.update,
+        page_id=page_id,
+        properties=_build_page_properties(title, category, tags),
+    )
+
+    stats = sync_page_blocks(page_id, children or [])
+    print(
+        f"♻️ [Notion] 頁面內容已同步: {page_id}"
+        f"（新增 {stats['appended']}、更新 {stats['updated']}、刪除 {stats['deleted']}、"
+        f"未變更 {stats['unchanged']}，共 {stats['api_calls']} 次寫入）"
+    )
+    return page_id
+
+
+def _set_status(page_id, status):
+    call_notion(
+        get_notion_client().pages.update,
         page_id=page_id,
         properties={"Status": {"status": {"name": status}}},
     )
+
+
+def update_page_status(page_id, status):
+    """僅更新 Notion 頁面的 Status 屬性"""
+    _set_status(page_id, status)
     print(f"✨ [Notion] 頁面狀態已更新為 {status}: {page_id}")
 
 
-def append_blocks_batched(page_id, blocks):
+def _verify_appended(page_id, offset, size):
+    """讀回頁面 block 數：已包含這個 batch 回傳 True，尚未寫入回傳 None。"""
+    written = count_child_blocks(page_id)
+    if written == offset + size:
+        return True
+    if written == offset:
+        return None
+    raise RuntimeError(
+        f"頁面 {page_id} 有 {written} 個 block（預期 {offset} 或 {offset + size}），無法確認 append 結果"
+    )
+
+
+def append_blocks_batched(page_id, blocks, start_offset=0, on_progress=None):
+    """以每批 100 個 append blocks；blocks 可為 generator，一次只持有一個 batch
+
+    start_offset 為 blocks 第一個元素在完整內容中的位置（續傳時使用），
+    需等於頁面目前的頂層 block 數：append 結果不明時以此讀回確認該 batch 是否已寫入。
+    每個 batch 成功後呼叫 on_progress(page_id, 下一個 offset)。
+    """
     notion = get_notion_client()
-    for start in range(0, len(blocks), NOTION_API_BATCH_SIZE):
-        batch = blocks[start:start + NOTION_API_BATCH_SIZE]
-        notion.blocks.children.append(block_id=page_id, children=batch)
+    offset = start_offset
+    for batch in _iter_batches(blocks):
+        _write_verified(
+            notion.blocks.children.append,
+            lambda: _verify_appended(page_id, offset, len(batch)),
+            block_id=page_id,
+            children=batch,
+        )
+        offset += len(batch)
+        if on_progress:
+            on_progress(page_id, offset)
+
+
+# ---------------------------------------------------------------------------
+# Async variants（同一個 event loop 上同時處理多個頁面）
+# ---------------------------------------------------------------------------
+
+async def update_page_status_async(page_id, status):
+    """update_page_status 的 asyncio 版本"""
+    notion = get_async_notion_client()
+    await call_notion_async(
+        notion.pages.update,
+        page_id=page_id,
+        properties={"Status": {"status": {"name": status}}},
+    )
+
+
+async def update_pages_status_bulk_async(page_ids, status, max_in_flight=BULK_STATUS_WORKERS):
+    """update_pages_status_bulk 的 asyncio 版本，回傳值相同。"""
+    page_ids = list(dict.fromkeys(page_ids))
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def update(page_id):
+        async with in_flight:
+            try:
+                await update_page_status_async(page_id, status)
+                return {"page_id": page_id, "ok": True, "error": None}
+            except Exception as e:
+                return {"page_id": page_id, "ok": False, "error": str(e)}
+
+    results = await asyncio.gather(*(update(page_id) for page_id in page_ids))
+
+    failed = {r["page_id"]: r["error"] for r in results if not r["ok"]}
+    print(f"✨ [Notion] {len(results) - len(failed)}/{len(results)} 個頁面狀態已更新為 {status}")
+    for page_id, error in failed.items():
+        print(f"❌ [Notion] {page_id} 狀態更新失敗: {error}")
+    return {"results": results, "updated": len(results) - len(failed), "failed": failed}
+
+
+def update_pages_status_bulk(page_ids, status, max_workers=BULK_STATUS_WORKERS):
+    """並行更新多個頁面的 Status：在單一 event loop 上最多 max_workers 個請求同時進行
+    （受共用 rate limiter 節流，可重試的錯誤仍會自動重試）。
+
+    回傳 dict：
+      results: [{"page_id", "ok", "error"}]，依輸入順序（重複的 page_id 只更新一次）
+      updated: 成功數
+      failed: {page_id: 錯誤訊息}
+    單一頁面失敗不會中斷其他頁面。
+    """
+    return run_async(update_pages_status_bulk_async(page_ids, status, max_in_flight=max_workers))
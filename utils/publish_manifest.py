@@ -0,0 +1,84 @@
+"""Persisted publish manifest: note title → content hash, Notion page_id, publish time.
+
+讓 draft_publisher 在重跑時跳過內容未變更的 draft，
+內容有變更時更新既有頁面而不是建立重複頁面。
+上傳中途失敗時，entry 會保留 checkpoint（已寫入的頂層 block 數），下次從該處續傳。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from constants import PUBLISH_MANIFEST_PATH, TW_TIMEZONE
+
+MANIFEST_VERSION = 1
+
+# Module-level cache (populated on first access); guarded for worker threads
+_manifest = None
+_lock = threading.Lock()
+
+
+def content_hash(metadata, body):
+    """以 frontmatter（正規化後）+ 正文計算 sha256。"""
+    h = hashlib.sha256()
+    h.update(json.dumps(metadata, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    h.update(b"\0")
+    h.update(body.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _load():
+    global _manifest
+    if _manifest is None:
+        if os.path.exists(PUBLISH_MANIFEST_PATH):
+            with open(PUBLISH_MANIFEST_PATH, "r", encoding="utf-8") as f:
+                _manifest = json.load(f)
+        else:
+            _manifest = {"version": MANIFEST_VERSION, "notes": {}}
+    return _manifest
+
+
+def _save():
+    """原子寫入（先寫暫存檔再 rename），避免中斷時留下半份 JSON。"""
+    os.makedirs(os.path.dirname(PUBLISH_MANIFEST_PATH) or ".", exist_ok=True)
+    tmp_path = f"{PUBLISH_MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, PUBLISH_MANIFEST_PATH)
+
+
+def get_entry(title):
+    """回傳該標題的 manifest entry（dict 副本），不存在則回傳 None。"""
+    with _lock:
+        entry = _load()["notes"].get(title)
+        return dict(entry) if entry else None
+
+
+def is_complete(entry):
+    """entry 是否代表已完整上傳（舊格式沒有 checkpoint 欄位，視為完成）。"""
+    return "checkpoint" not in entry
+
+
+def record_checkpoint(title, digest, page_id, offset):
+    """記錄上傳進度：page_id 已有前 offset 個頂層 blocks，並立即落盤。"""
+    with _lock:
+        _load()["notes"][title] = {
+            "hash": digest,
+            "page_id": page_id,
+            "checkpoint": offset,
+        }
+        _save()
+
+
+def record_publish(title, digest, page_id):
+    """記錄成功寫入 Notion 的內容 hash 與 page_id（清除 checkpoint），並立即落盤。"""
+    with _lock:
+        _load()["notes"][title] = {
+            "hash": digest,
+            "page_id": page_id,
+            "published_at": datetime.now(TW_TIMEZONE).isoformat(timespec="seconds"),
+        }
+        _save()
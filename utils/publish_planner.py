@@ -0,0 +1,139 @@
+"""Dry-run planner: estimate Notion payload size and request count before publishing.
+
+純計算、不呼叫 API。依 draft_publisher 對每個 draft 做的 manifest 決定
+（建立、checkpoint 續傳、diff 同步或略過）與 create_page_in_database / append_blocks_batched
+的實際分批方式計算請求數，並在送出前標出會違反 Notion 限制的 blocks。
+"""
+
+import json
+import math
+import os
+
+from constants import (
+    NOTION_API_BATCH_SIZE,
+    NOTION_MAX_NESTING_DEPTH,
+    NOTION_REQUEST_BLOCK_LIMIT,
+    NOTION_REQUEST_PAYLOAD_LIMIT,
+    NOTION_REQUESTS_PER_SECOND,
+    NOTION_RICH_TEXT_ARRAY_LIMIT,
+    NOTION_RICH_TEXT_LIMIT,
+    NOTION_URL_LIMIT,
+)
+from md_to_notion import utf16_len
+
+
+def _payload_bytes(obj):
+    return len(json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+
+def _block_children(block):
+    data = block.get(block.get("type"), {})
+    return data.get("children", []) if isinstance(data, dict) else []
+
+
+def _walk(blocks, depth, stats, issues, path):
+    """遞迴統計 block 數與深度，並收集違反限制的問題。"""
+    for i, block in enumerate(blocks):
+        btype = block.get("type", "unknown")
+        where = f"{path}{i}:{btype}"
+        stats["blocks"] += 1
+        stats["max_depth"] = max(stats["max_depth"], depth)
+        if depth > NOTION_MAX_NESTING_DEPTH:
+            issues.append(f"[巢狀過深] {where} 位於第 {depth} 層（單一請求上限 {NOTION_MAX_NESTING_DEPTH}）")
+
+        data = block.get(btype, {})
+        if not isinstance(data, dict):
+            continue
+        rich_texts = [data.get("rich_text", [])] + list(data.get("cells", []))
+        for rich_text in rich_texts:
+            if len(rich_text) > NOTION_RICH_TEXT_ARRAY_LIMIT:
+                issues.append(f"[rich_text 元素過多] {where} 有 {len(rich_text)} 個元素")
+            for rt in rich_text:
+                text = rt.get("text", {})
+                length = utf16_len(text.get("content", ""))
+                if length > NOTION_RICH_TEXT_LIMIT:
+                    issues.append(f"[超長 rich_text] {where} 有 {length} 字元")
+                url = (text.get("link") or {}).get("url", "")
+                if len(url) > NOTION_URL_LIMIT:
+                    issues.append(f"[超長 URL] {where} 連結長度 {len(url)}")
+
+        children = _block_children(block)
+        if len(children) > NOTION_API_BATCH_SIZE:
+            issues.append(f"[children 過多] {where} 有 {len(children)} 個子 blocks")
+        _walk(children, depth + 1, stats, issues, f"{where}/")
+
+
+def plan_page(blocks, action="create", offset=0, requests_per_second=None):
+    """估算發布一頁所需的請求與 payload。
+
+    action 對應 draft_publisher 依 manifest 做的決定：
+    - create：第一批隨 pages.create 送出，其餘每 100 個一次 blocks.children.append
+    - resume：讀回頁面確認已寫入 offset 個 blocks 後，其餘分批 append
+    - update：pages.update 後以 sync_page_blocks diff 同步；讀取與寫入數視既有頁面而定，只估下限
+    - skip：內容未變更，只更新 Status（blocks 可為空）
+    回傳 dict：blocks, top_level, max_depth, json_bytes, requests（依 API 分類）,
+    total_requests, lower_bound, estimated_seconds, issues。
+    """
+    if requests_per_second is None:
+        requests_per_second = float(
+            os.environ.get("NOTION_REQUESTS_PER_SECOND", NOTION_REQUESTS_PER_SECOND))
+    blocks = list(blocks)[offset:] if action == "resume" else list(blocks)
+    stats = {"blocks": 0, "max_depth": 0}
+    issues = []
+    _walk(blocks, 0, stats, issues, "")
+
+    batches = [blocks[i:i + NOTION_API_BATCH_SIZE]
+               for i in range(0, len(blocks), NOTION_API_BATCH_SIZE)]
+    for n, batch in enumerate(batches):
+        label = "pages.create" if action == "create" and n == 0 else f"append #{n + 1}"
+        batch_stats = {"blocks": 0, "max_depth": 0}
+        _walk(batch, 0, batch_stats, [], "")
+        if batch_stats["blocks"] > NOTION_REQUEST_BLOCK_LIMIT:
+            issues.append(f"[請求 blocks 過多] {label} 含 {batch_stats['blocks']} 個 blocks"
+                          f"（上限 {NOTION_REQUEST_BLOCK_LIMIT}）")
+        size = _payload_bytes(batch)
+        if size > NOTION_REQUEST_PAYLOAD_LIMIT:
+            issues.append(f"[請求 payload 過大] {label} 約 {size:,} bytes"
+                          f"（上限 {NOTION_REQUEST_PAYLOAD_LIMIT:,}）")
+
+    requests = {"pages.create": 0, "pages.update": 1, "blocks.children.list": 0, "blocks.children.append": 0}
+    if action == "create":
+        requests["pages.create"] = 1
+        requests["blocks.children.append"] = max(0, len(batches) - 1)
+    elif action == "resume":
+        # 續傳前先讀回已寫入的 block 數確認 checkpoint（每頁 100 個）
+        requests["blocks.children.list"] = max(1, math.ceil(offset / NOTION_API_BATCH_SIZE))
+        requests["blocks.children.append"] = len(batches)
+    elif action == "update":
+        # properties 更新一次；diff 至少讀一次現有 blocks，寫入數要等讀到頁面內容才知道
+        requests["pages.update"] += 1
+        requests["blocks.children.list"] = 1
+    total = sum(requests.values())
+    return {
+        "blocks": stats["blocks"],
+        "top_level": len(blocks),
+        "max_depth": stats["max_depth"],
+        "json_bytes": _payload_bytes(blocks),
+        "requests": requests,
+        "total_requests": total,
+        "lower_bound": action == "update",
+        "estimated_seconds": math.ceil(total / requests_per_second * 10) / 10,
+        "issues": issues,
+    }
+
+
+def format_plan(plan, max_issues=10):
+    """將 plan_page 的結果排版成多行文字（問題最多列出 max_issues 個）。"""
+    lines = [
+        f"  Blocks: {plan['blocks']}（頂層 {plan['top_level']}，最大深度 {plan['max_depth']}）",
+        f"  JSON 大小: {plan['json_bytes']:,} bytes",
+        "  API 請求: " + "、".join(f"{name} × {count}" for name, count in plan["requests"].items() if count),
+        f"  預估耗時: {'至少 ' if plan['lower_bound'] else ''}{plan['estimated_seconds']}s"
+        f"（{'至少' if plan['lower_bound'] else '共'} {plan['total_requests']} 次請求）",
+    ]
+    if plan["issues"]:
+        lines.append(f"  ⚠️ 違反 Notion 限制 ({len(plan['issues'])} 個):")
+        lines.extend(f"    - {issue}" for issue in plan["issues"][:max_issues])
+        if len(plan["issues"]) > max_issues:
+            lines.append(f"    ...（另有 {len(plan['issues']) - max_issues} 個）")
+    return "\n".join(lines)
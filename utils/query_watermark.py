@@ -0,0 +1,75 @@
+"""Persisted last_edited_time watermarks for incremental Notion database queries.
+
+每個 key（例如 "drafts"、"export:Processed"）記錄上次處理到的 last_edited_time，
+下次查詢只取 on_or_after 該時間的頁面，而不是每次都分頁讀完整個資料庫。
+呼叫端在處理成功後才推進 watermark，失敗的頁面下次會再被查到。
+"""
+
+import json
+import os
+import threading
+
+from constants import QUERY_WATERMARK_PATH
+
+WATERMARK_VERSION = 1
+
+# Module-level cache (populated on first access); guarded for worker threads
+_watermarks = None
+_lock = threading.Lock()
+
+
+def _load():
+    global _watermarks
+    if _watermarks is None:
+        if os.path.exists(QUERY_WATERMARK_PATH):
+            with open(QUERY_WATERMARK_PATH, "r", encoding="utf-8") as f:
+                _watermarks = json.load(f)
+        else:
+            _watermarks = {"version": WATERMARK_VERSION, "watermarks": {}}
+    return _watermarks
+
+
+def _save():
+    """原子寫入（先寫暫存檔再 rename），避免中斷時留下半份 JSON。"""
+    os.makedirs(os.path.dirname(QUERY_WATERMARK_PATH) or ".", exist_ok=True)
+    tmp_path = f"{QUERY_WATERMARK_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_watermarks, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, QUERY_WATERMARK_PATH)
+
+
+def watermark_key(name, statuses=None):
+    """組出 watermark key：依用途、資料庫與 Status 過濾條件分開記錄。"""
+    if isinstance(statuses, str):
+        statuses = [statuses]
+    database_id = os.environ.get("NOTION_DATABASE_ID", "")
+    return f"{name}:{database_id}:{','.join(sorted(statuses)) if statuses else '*'}"
+
+
+def load_watermark(key):
+    """回傳 key 上次記錄的 last_edited_time（ISO 字串），沒有則回傳 None。"""
+    with _lock:
+        return _load()["watermarks"].get(key)
+
+
+def save_watermark(key, last_edited_time):
+    """記錄 key 的 last_edited_time，並立即落盤。"""
+    with _lock:
+        _load()["watermarks"][key] = last_edited_time
+        _save()
+
+
+def advance_watermark(key, pages):
+    """將 watermark 推進到 pages 中最新的 last_edited_time（pages 為空時不變）。
+
+    Notion 的時間字串格式固定（"2024-01-01T00:00:00.000Z"），可直接以字串比較。
+    """
+    if not pages:
+        return load_watermark(key)
+    newest = max(page["last_edited_time"] for page in pages)
+    current = load_watermark(key)
+    if current is None or newest > current:
+        save_watermark(key, newest)
+        return newest
+    return current
@@ -0,0 +1,57 @@
+"""Thread-safe token-bucket rate limiter shared by all Notion API calls."""
+
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket：平均每秒 `rate` 個請求，允許最多 `burst` 個瞬間突發。"""
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """預約一個 token，回傳需要等待的秒數（可能為 0）。"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+            # 允許 tokens 變成負數：代表已被後續呼叫者預約，等待時間依序遞增
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def pause(self, seconds):
+        """暫停發放 token seconds 秒（例如收到 429 Retry-After），之後的 acquire 依序等待。
+
+        已經在等待中的呼叫不受影響。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 下一次 _reserve 扣掉 1 後恰好需要等待 seconds
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+    def acquire(self):
+        """阻塞直到取得一個 token，回傳實際等待秒數。"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """acquire() 的 asyncio 版本：等待期間不阻塞 event loop。"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
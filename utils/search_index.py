@@ -0,0 +1,331 @@
+"""Incremental full-text search index over notes/ (SQLite inverted index + BM25).
+
+以 md_to_notion 的 mistune AST 解析每篇筆記，依標題切成 section（記錄標題層級與行號），
+中文以 bigram、英數以單字 tokenize 後寫入 SQLite 的倒排索引（postings），查詢時以 BM25 排序。
+更新時依檔案 mtime 與內容 hash 只重建有變動的筆記，索引存在 .cache/ 下不進版控。
+"""
+
+import glob
+import hashlib
+import heapq
+import math
+import os
+import re
+import sqlite3
+from collections import Counter, defaultdict
+
+from constants import NOTES_DIR, SEARCH_INDEX_PATH
+from md_to_notion import is_toc_list, parse_markdown
+
+SCHEMA_VERSION = 5
+
+# BM25 參數
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 標題中的詞權重加倍
+HEADING_WEIGHT = 2
+# 平均 section 長度偏離計算 impact 時的值超過此比例，才重算所有 postings 的 impact
+IMPACT_DRIFT = 0.1
+# 每個查詢詞只取 impact 最高的前 N 筆 postings 計分，查詢耗時不隨語料線性成長
+SEARCH_CANDIDATES_PER_TERM = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    hash TEXT NOT NULL,
+    title TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    heading TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sections_path ON sections(path);
+-- length 為 section 的 token 數（與 sections.length 相同）；
+-- impact 為預先算好的 BM25 詞頻項 tf·(k1+1) / (tf + k1·(1-b+b·length/avgdl))，查詢時只需乘上 idf
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    section_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    impact REAL NOT NULL,
+    PRIMARY KEY (term, section_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_section ON postings(section_id);
+CREATE INDEX IF NOT EXISTS postings_impact ON postings(term, impact DESC);
+-- BM25 需要的語料統計（section 數、平均長度），每次更新後重算，查詢時不必掃描 sections；
+-- impact_avg_length 為目前 postings.impact 所用的平均長度
+CREATE TABLE IF NOT EXISTS corpus (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    sections INTEGER NOT NULL,
+    avg_length REAL NOT NULL,
+    impact_avg_length REAL NOT NULL
+);
+"""
+
+# CJK 統一表意文字（含擴充 A）、日文假名、韓文音節
+_CJK = r"㐀-䶿一-鿿぀-ヿ가-힯"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[a-z0-9_]+(?:[.+#-][a-z0-9_]+)*")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+_ATX_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]|$)")
+_FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+_SETEXT_UNDERLINE_RE = re.compile(r"^ {0,3}(=+|-+)[ \t]*$")
+# 不會成為段落（因此也不會成為 setext 標題）開頭的行：清單、引言、表格、HTML、分隔線
+_NON_PARAGRAPH_RE = re.compile(r"^(?:[ \t]|[-+*](?:[ \t]|$)|\d{1,9}[.)](?:[ \t]|$)|>|\||<|(?:[-*_][ \t]*){3,}$)")
+
+
+def tokenize(text):
+    """小寫化後切詞：中日韓連續字元拆成 bigram（單字則保留單字），英數以單字為單位。"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        word = match.group()
+        if _CJK_RE.match(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# Markdown → sections
+# ---------------------------------------------------------------------------
+
+def _token_text(token):
+    """從 block / inline AST token 遞迴取出純文字"""
+    if "raw" in token:
+        return token["raw"]
+    return " ".join(_token_text(child) for child in token.get("children", []))
+
+
+def _heading_lines(markdown_text):
+    """回傳 code fence 外標題的行號（1-based）：{"atx": [...], "setext": [...]}。
+
+    setext 標題（下一行為 === 或 ---）記錄文字所在段落的第一行。
+    兩種標題分開記錄，由 split_sections 依 AST heading 的 style 各自對應，
+    即使某個 setext 標題沒被辨識出來也不會影響 ATX 標題的行號。
+    """
+    lines = {"atx": [], "setext": []}
+    fence = None
+    paragraph = None  # 目前段落第一行的行號
+    for number, line in enumerate(markdown_text.split("\n"), start=1):
+        match = _FENCE_RE.match(line)
+        if match:
+            if fence is None:
+                fence = match.group(1)
+            elif match.group(1) == fence:
+                fence = None
+            paragraph = None
+            continue
+        if fence is not None:
+            continue
+        if _ATX_HEADING_RE.match(line):
+            lines["atx"].append(number)
+            paragraph = None
+        elif paragraph is not None and _SETEXT_UNDERLINE_RE.match(line):
+            lines["setext"].append(paragraph)
+            paragraph = None
+        elif not line.strip() or _NON_PARAGRAPH_RE.match(line):
+            paragraph = None
+        elif paragraph is None:
+            paragraph = number
+    return lines
+
+
+def split_sections(markdown_text):
+    """將筆記依標題切成 sections：[{"heading", "level", "line", "text"}]。
+
+    第一個標題前的內容歸在 level 0 的 section；TOC 清單不納入索引。
+    """
+    heading_lines = {style: iter(lines) for style, lines in _heading_lines(markdown_text).items()}
+    sections = [{"heading": "", "level": 0, "line": 1, "parts": []}]
+    for token in parse_markdown(markdown_text):
+        ttype = token.get("type")
+        if ttype == "heading":
+            sections.append({
+                "heading": _token_text(token).strip(),
+                "level": token.get("attrs", {}).get("level", 1),
+                "line": next(heading_lines.get(token.get("style"), iter(())), sections[-1]["line"]),
+                "parts": [],
+            })
+        elif ttype == "list" and is_toc_list(token):
+            continue
+        elif ttype != "blank_line":
+            sections[-1]["parts"].append(_token_text(token))
+
+    result = []
+    for section in sections:
+        text = "\n".join(p.strip() for p in section.pop("parts") if p.strip())
+        if section["heading"] or text:
+            result.append(dict(section, text=text))
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Index maintenance
+# ---------------------------------------------------------------------------
+
+def connect(path=SEARCH_INDEX_PATH):
+    """開啟（必要時建立）索引資料庫；schema 版本不符時清空重建。"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS sections; "
+                           "DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS corpus;")
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def _note_files(notes_dir):
+    # 略過 .vitepress 等隱藏目錄與首頁
+    return sorted(
+        path for path in glob.glob(os.path.join(notes_dir, "**", "*.md"), recursive=True)
+        if not any(part.startswith(".") for part in os.path.relpath(path, notes_dir).split(os.sep))
+        and os.path.relpath(path, notes_dir) != "index.md"
+    )
+
+
+def _remove_file(conn, path):
+    conn.execute("DELETE FROM postings WHERE section_id IN (SELECT id FROM sections WHERE path = ?)",
+                 (path,))
+    conn.execute("DELETE FROM sections WHERE path = ?", (path,))
+    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+
+def _impact(tf, length, avg_length):
+    return tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+
+
+def _index_file(conn, path, content, mtime, digest, avg_length):
+    _remove_file(conn, path)
+    sections = split_sections(content)
+    title = next((s["heading"] for s in sections if s["level"] == 1),
+                 os.path.splitext(os.path.basename(path))[0])
+    conn.execute("INSERT INTO files (path, mtime, hash, title) VALUES (?, ?, ?, ?)",
+                 (path, mtime, digest, title))
+    for section in sections:
+        counts = Counter(tokenize(section["text"]))
+        for term in tokenize(section["heading"]):
+            counts[term] += HEADING_WEIGHT
+        length = sum(counts.values())
+        cursor = conn.execute(
+            "INSERT INTO sections (path, heading, level, line, length, text) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, section["heading"], section["level"], section["line"], length, section["text"]))
+        conn.executemany(
+            "INSERT INTO postings (term, section_id, tf, length, impact) VALUES (?, ?, ?, ?, ?)",
+            [(term, cursor.lastrowid, tf, length, _impact(tf, length, avg_length))
+             for term, tf in counts.items()])
+
+
+def _update_corpus(conn):
+    """重算語料統計；平均長度偏離超過 IMPACT_DRIFT 時重算所有 postings 的 impact。"""
+    sections, avg_length = conn.execute(
+        "SELECT COUNT(*), COALESCE(AVG(length), 0) FROM sections").fetchone()
+    row = conn.execute("SELECT impact_avg_length FROM corpus").fetchone()
+    impact_avg_length = row[0] if row else 0
+    if avg_length and (not impact_avg_length
+                       or abs(avg_length - impact_avg_length) > impact_avg_length * IMPACT_DRIFT):
+        conn.execute(
+            "UPDATE postings SET impact = tf * (:k1 + 1) / (tf + :k1 * (1 - :b + :b * length / :avgdl))",
+            {"k1": BM25_K1, "b": BM25_B, "avgdl": avg_length})
+        impact_avg_length = avg_length
+    conn.execute("INSERT OR REPLACE INTO corpus (id, sections, avg_length, impact_avg_length) "
+                 "VALUES (1, ?, ?, ?)", (sections, avg_length, impact_avg_length))
+
+
+def update_index(conn, notes_dir=NOTES_DIR, rebuild=False):
+    """依 mtime / 內容 hash 增量更新索引，回傳 {"indexed", "touched", "removed", "unchanged"}。
+
+    mtime 變了但 hash 相同（例如 git checkout）只更新 mtime，不重新 tokenize。
+    新寫入的 postings 沿用目前的 impact_avg_length 計算 impact，語料平均長度明顯改變時才全部重算。
+    """
+    stats = {"indexed": 0, "touched": 0, "removed": 0, "unchanged": 0}
+    known = {path: (mtime, digest) for path, mtime, digest
+             in conn.execute("SELECT path, mtime, hash FROM files")}
+    with conn:
+        if rebuild:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM sections")
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM corpus")
+            known = {}
+        row = conn.execute("SELECT impact_avg_length FROM corpus").fetchone()
+        # 首次建立索引時平均長度未知，先以 1 計算，結束時 _update_corpus 會全部重算
+        avg_length = row[0] if row and row[0] else 1
+
+        current = _note_files(notes_dir)
+        for path in current:
+            mtime = os.stat(path).st_mtime
+            previous = known.get(path)
+            if previous and previous[0] == mtime:
+                stats["unchanged"] += 1
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            if previous and previous[1] == digest:
+                conn.execute("UPDATE files SET mtime = ? WHERE path = ?", (mtime, path))
+                stats["touched"] += 1
+                continue
+            _index_file(conn, path, content, mtime, digest, avg_length)
+            stats["indexed"] += 1
+
+        for path in set(known) - set(current):
+            _remove_file(conn, path)
+            stats["removed"] += 1
+
+        if stats["indexed"] or stats["removed"] or rebuild:
+            _update_corpus(conn)
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Query
+# ---------------------------------------------------------------------------
+
+def search(conn, query, limit=10, candidates=SEARCH_CANDIDATES_PER_TERM):
+    """以 BM25 排序查詢，回傳 [{"score", "path", "title", "heading", "line", "text"}]。
+
+    每個查詢詞只讀取 impact 最高的前 candidates 筆 postings（走 postings_impact 索引），
+    df 不超過 candidates 的詞分數精確；極常見的詞只截掉對該詞貢獻最低的 sections。
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    corpus = conn.execute("SELECT sections FROM corpus").fetchone()
+    if not corpus or not corpus[0]:
+        return []
+    total = corpus[0]
+
+    scores = defaultdict(float)
+    for term in terms:
+        df = conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+        if not df:
+            continue
+        idf = math.log((total - df + 0.5) / (df + 0.5) + 1)
+        for section_id, impact in conn.execute(
+                "SELECT section_id, impact FROM postings WHERE term = ? ORDER BY impact DESC LIMIT ?",
+                (term, candidates)):
+            scores[section_id] += idf * impact
+    top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    if not top:
+        return []
+    placeholders = ",".join("?" * len(top))
+    rows = {row[0]: row[1:] for row in conn.execute(
+        f"SELECT s.id, s.path, f.title, s.heading, s.line, s.text FROM sections s "
+        f"JOIN files f ON f.path = s.path WHERE s.id IN ({placeholders})",
+        [section_id for section_id, _ in top])}
+    return [
+        dict(zip(("path", "title", "heading", "line", "text"), rows[section_id]), score=score)
+        for section_id, score in top
+    ]